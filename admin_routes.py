@@ -1,26 +1,39 @@
-from flask import render_template, request, redirect, url_for, flash, Blueprint
+from flask import render_template, request, redirect, url_for, flash, Blueprint, jsonify, Response, stream_with_context
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import check_password_hash, generate_password_hash
-from werkzeug.utils import secure_filename
+from werkzeug.exceptions import RequestEntityTooLarge
 from app import app, db
 from models import Admin, Product, Category, Order, OrderItem, CompanySettings
-from datetime import datetime
-import os
-import uuid
+from settings_cache import invalidate_settings
+from validation import sanitize_text
+from pricing import convert_currency
+import queries
+import dashboard_stats
+import analytics
+import exports
+import product_import
+import exchange_rates
+import search_index
+import images
+from themes import build_stylesheet
+from page_cache import bump_catalog_version
+from database import retry_on_busy
+from pagination import keyset_paginate
+from datetime import datetime, date, timedelta
 
 # Admin Blueprint
 admin = Blueprint('admin', __name__, url_prefix='/admin')
 
-# Upload configuration
-UPLOAD_FOLDER = 'static/uploads'
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+# Bulk product import
+IMPORT_EXTENSIONS = ('.csv', '.json')
+MAX_IMPORT_ERRORS_SHOWN = 200
 
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
-
-def create_upload_folder():
-    if not os.path.exists(UPLOAD_FOLDER):
-        os.makedirs(UPLOAD_FOLDER)
+# Admin forms only: storefront posts keep the plain 413
+@admin.errorhandler(RequestEntityTooLarge)
+def upload_too_large(error):
+    limit = app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)
+    flash(f'Upload too large: at most {limit} MB can be sent at once', 'error')
+    return redirect(request.referrer or url_for('admin.products'))
 
 @admin.route('/')
 def index():
@@ -57,39 +70,29 @@ def logout():
 @login_required
 def dashboard():
     # Statistics
-    total_products = Product.query.count()
-    total_orders = Order.query.count()
-    pending_orders = Order.query.filter_by(status='pending').count()
-    total_revenue = db.session.query(db.func.sum(Order.total_amount)).filter_by(status='confirmed').scalar() or 0
+    stats = dashboard_stats.get_dashboard_stats()
 
     # Recent orders
     recent_orders = Order.query.order_by(Order.created_at.desc()).limit(5).all()
 
     return render_template('admin/dashboard.html',
-                         total_products=total_products,
-                         total_orders=total_orders,
-                         pending_orders=pending_orders,
-                         total_revenue=total_revenue,
-                         recent_orders=recent_orders)
+                         total_products=stats.total_products,
+                         total_orders=stats.total_orders,
+                         pending_orders=stats.pending_orders,
+                         total_revenue=stats.total_revenue,
+                         recent_orders=recent_orders,
+                         daily_revenue=dashboard_stats.revenue_by_day(),
+                         monthly_revenue=dashboard_stats.revenue_by_month())
 
 @admin.route('/products')
 @login_required
 def products():
-    page = request.args.get('page', 1, type=int)
     search = request.args.get('search', '')
     category_id = request.args.get('category')
 
-    query = Product.query
-
-    if search:
-        query = query.filter(Product.name_en.contains(search) | Product.name_id.contains(search))
-
-    if category_id:
-        query = query.filter_by(category_id=category_id)
-
-    products = query.order_by(Product.created_at.desc()).paginate(
-        page=page, per_page=10, error_out=False
-    )
+    products = keyset_paginate(queries.admin_products(search, category_id),
+                               Product.created_at, Product.id,
+                               after=request.args.get('after'), before=request.args.get('before'))
 
     categories = Category.query.all()
 
@@ -99,47 +102,22 @@ def products():
                          search=search,
                          selected_category=category_id)
 
-def sanitize_text(text):
-    """Remove or replace problematic Unicode characters"""
-    if not text:
-        return text
-    # Remove common emoji and special Unicode characters that cause encoding issues
-    import re
-    # Replace common problematic characters
-    text = re.sub(r'[\u2700-\u27BF]', '', text)  # Remove dingbats
-    text = re.sub(r'[\u2600-\u26FF]', '', text)  # Remove miscellaneous symbols
-    text = re.sub(r'[\u2000-\u206F]', ' ', text)  # Replace general punctuation with space
-    # Ensure the text can be encoded as UTF-8
-    try:
-        text.encode('utf-8')
-        return text.strip()
-    except UnicodeEncodeError:
-        # If still problematic, keep only ASCII characters
-        return ''.join(char for char in text if ord(char) < 128).strip()
-
 @admin.route('/products/add', methods=['GET', 'POST'])
 @login_required
 def add_product():
     if request.method == 'POST':
-        create_upload_folder()
-
-        # Handle image upload
-        image_url = request.form.get('image_url', '')
-        if 'image_file' in request.files:
-            file = request.files['image_file']
-            if file and file.filename != '' and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                # Add unique identifier to prevent filename conflicts
-                unique_filename = f"{uuid.uuid4().hex}_{filename}"
-                file_path = os.path.join(UPLOAD_FOLDER, unique_filename)
-                file.save(file_path)
-                image_url = f"/static/uploads/{unique_filename}"
+        # Handle image upload (stored under its content hash, variants made in the background)
+        try:
+            image_url = images.save_upload(request.files.get('image_file')) or request.form.get('image_url', '')
+        except images.UploadRejected as e:
+            flash(f'Image not saved: {str(e)}', 'error')
+            return redirect(url_for('admin.add_product'))
 
         # Sanitize text inputs to prevent Unicode encoding errors
         try:
             # Price input is in IDR (base currency)
             price_idr = float(request.form['price'])
-            price_usd = price_idr / 15300  # Convert IDR to USD for reference only
+            price_usd = convert_currency(price_idr, 'IDR', 'USD')  # Convert IDR to USD for reference only
 
             product = Product(
                 name_en=sanitize_text(request.form['name_en']),
@@ -157,7 +135,11 @@ def add_product():
             )
 
             db.session.add(product)
+            db.session.flush()
+            search_index.index_product(product)
+            dashboard_stats.record_products_added()
             db.session.commit()
+            bump_catalog_version()
 
             flash('Product added successfully!', 'success')
             return redirect(url_for('admin.products'))
@@ -168,35 +150,58 @@ def add_product():
     categories = Category.query.all()
     return render_template('admin/products.html', categories=categories, action='add')
 
+@admin.route('/products/import', methods=['GET', 'POST'])
+@login_required
+@retry_on_busy
+def import_products():
+    result = None
+    if request.method == 'POST':
+        file = request.files.get('import_file')
+        if not file or not file.filename.lower().endswith(IMPORT_EXTENSIONS):
+            flash('Please choose a .csv or .json file', 'error')
+            return redirect(url_for('admin.import_products'))
+
+        dry_run = bool(request.form.get('dry_run'))
+        file.stream.seek(0)  # retry_on_busy may run the view again
+        try:
+            result = product_import.import_products(product_import.read_rows(file.stream, file.filename),
+                                                    dry_run=dry_run)
+        except (ValueError, UnicodeDecodeError) as e:
+            db.session.rollback()
+            flash(f'Could not read {file.filename}: {str(e)}', 'error')
+            return redirect(url_for('admin.import_products'))
+
+        if not dry_run:
+            db.session.commit()
+            bump_catalog_version()
+        flash(f'{"Checked" if dry_run else "Imported"} {result.rows} rows: '
+              f'{result.inserted} new, {result.updated} updated, {len(result.errors)} skipped',
+              'warning' if result.errors else 'success')
+
+    return render_template('admin/product_import.html', result=result,
+                           columns=product_import.COLUMNS, max_errors=MAX_IMPORT_ERRORS_SHOWN)
+
 @admin.route('/products/edit/<int:product_id>', methods=['GET', 'POST'])
 @login_required
 def edit_product(product_id):
     product = Product.query.get_or_404(product_id)
 
     if request.method == 'POST':
-        create_upload_folder()
-
         # Handle image upload
         image_url = request.form.get('image_url', product.image_url)
-        if 'image_file' in request.files:
-            file = request.files['image_file']
-            if file and file.filename != '' and allowed_file(file.filename):
-                # Delete old image if it exists and is not a URL
-                if product.image_url and product.image_url.startswith('/static/uploads/'):
-                    old_file_path = product.image_url[1:]  # Remove leading slash
-                    if os.path.exists(old_file_path):
-                        os.remove(old_file_path)
-
-                filename = secure_filename(file.filename)
-                unique_filename = f"{uuid.uuid4().hex}_{filename}"
-                file_path = os.path.join(UPLOAD_FOLDER, unique_filename)
-                file.save(file_path)
-                image_url = f"/static/uploads/{unique_filename}"
+        try:
+            uploaded_url = images.save_upload(request.files.get('image_file'))
+        except images.UploadRejected as e:
+            flash(f'Image not saved: {str(e)}', 'error')
+            return redirect(url_for('admin.edit_product', product_id=product_id))
+        if uploaded_url:
+            image_url = uploaded_url
+        old_image_url = product.image_url
 
         try:
             # Price input is in IDR (base currency)
             price_idr = float(request.form['price'])
-            price_usd = price_idr / 15300  # Convert IDR to USD for reference only
+            price_usd = convert_currency(price_idr, 'IDR', 'USD')  # Convert IDR to USD for reference only
 
             product.name_en = sanitize_text(request.form['name_en'])
             product.name_id = sanitize_text(request.form['name_id'])
@@ -212,7 +217,12 @@ def edit_product(product_id):
             product.is_available = bool(request.form.get('is_available'))
             product.updated_at = datetime.utcnow()
 
+            db.session.flush()
+            search_index.index_product(product)
             db.session.commit()
+            bump_catalog_version()
+            if product.image_url != old_image_url:
+                images.schedule_gc()  # the replaced image may be unused now
         except (ValueError, UnicodeEncodeError) as e:
             flash(f'Error updating product: Please check your input for special characters. {str(e)}', 'error')
             db.session.rollback()
@@ -229,10 +239,17 @@ def edit_product(product_id):
 
 @admin.route('/products/delete/<int:product_id>')
 @login_required
+@retry_on_busy
 def delete_product(product_id):
     product = Product.query.get_or_404(product_id)
+    search_index.remove_product(product.id)
+    image_url = product.image_url
     db.session.delete(product)
+    dashboard_stats.record_products_deleted()
     db.session.commit()
+    bump_catalog_version()
+    if image_url:
+        images.schedule_gc()
 
     flash('Product deleted successfully!', 'success')
     return redirect(url_for('admin.products'))
@@ -240,7 +257,6 @@ def delete_product(product_id):
 @admin.route('/orders')
 @login_required
 def orders():
-    page = request.args.get('page', 1, type=int)
     status = request.args.get('status', 'all')
 
     query = Order.query
@@ -248,24 +264,64 @@ def orders():
     if status != 'all':
         query = query.filter_by(status=status)
 
-    orders = query.order_by(Order.created_at.desc()).paginate(
-        page=page, per_page=10, error_out=False
+    orders = keyset_paginate(query, Order.created_at, Order.id,
+                             after=request.args.get('after'), before=request.args.get('before'))
+
+    return render_template('admin/orders.html', orders=orders, selected_status=status,
+                           xlsx_export=exports.xlsx_available())
+
+@admin.route('/orders/export')
+@login_required
+def export_orders():
+    statuses = [status for status in request.args.getlist('status') if status != 'all']
+    try:
+        start = date.fromisoformat(request.args['start']) if request.args.get('start') else None
+        end = date.fromisoformat(request.args['end']) if request.args.get('end') else None
+    except ValueError:
+        flash('Invalid export date range', 'error')
+        return redirect(url_for('admin.orders'))
+
+    statement = exports.order_export_statement(
+        statuses,
+        shipping_status=request.args.get('shipping_status', 'all'),
+        shipping_type=request.args.get('type', 'all'),
+        start=start,
+        end=end,
     )
+    filename = f"orders-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}"
+
+    if request.args.get('format') == 'xlsx':
+        if not exports.xlsx_available():
+            flash('XLSX export needs openpyxl installed; use CSV instead', 'error')
+            return redirect(url_for('admin.orders'))
+        body = exports.xlsx_stream(exports.export_rows(statement))
+        mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        filename += '.xlsx'
+    else:
+        body = exports.csv_stream(exports.export_rows(statement))
+        mimetype = 'text/csv'
+        filename += '.csv'
 
-    return render_template('admin/orders.html', orders=orders, selected_status=status)
+    # The generator runs after the view returns; keep the request (and its
+    # database session) alive until the last row is sent
+    return Response(stream_with_context(body), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
 
 @admin.route('/orders/<int:order_id>')
 @login_required
 def order_detail(order_id):
-    order = Order.query.get_or_404(order_id)
+    order = queries.order_with_items_or_404(order_id)
     return render_template('admin/orders.html', order=order, action='detail')
 
 @admin.route('/orders/<int:order_id>/update', methods=['POST'])
 @login_required
+@retry_on_busy
 def update_order(order_id):
     order = Order.query.get_or_404(order_id)
 
+    old_status = order.status
     order.status = request.form['status']
+    dashboard_stats.record_status_change(order, old_status)
     order.admin_notes = request.form.get('admin_notes', '')
 
     # Update shipping tracking information
@@ -300,7 +356,6 @@ def update_order(order_id):
 @login_required
 def shipping_tracking():
     try:
-        page = request.args.get('page', 1, type=int)
         status = request.args.get('status', 'all')
         shipping_type = request.args.get('type', 'all')  # all, domestic, international
 
@@ -314,20 +369,23 @@ def shipping_tracking():
         elif shipping_type == 'international':
             query = query.filter_by(is_international=True)
 
-        orders = query.order_by(Order.shipping_date.desc().nullslast()).paginate(
-            page=page, per_page=10, error_out=False
-        )
+        # Orders marked delivered without ever being shipped have no date; they come last
+        orders = keyset_paginate(query, Order.shipping_date, Order.id,
+                                 after=request.args.get('after'), before=request.args.get('before'),
+                                 nullable=True)
 
         return render_template('admin/shipping.html', 
                              orders=orders, 
                              selected_status=status,
-                             selected_type=shipping_type)
+                             selected_type=shipping_type,
+                             xlsx_export=exports.xlsx_available())
     except Exception as e:
         flash(f'Error loading shipping page: {str(e)}', 'error')
         return redirect(url_for('admin.dashboard'))
 
 @admin.route('/orders/<int:order_id>/tracking', methods=['POST'])
 @login_required
+@retry_on_busy
 def update_tracking(order_id):
     order = Order.query.get_or_404(order_id)
 
@@ -344,22 +402,17 @@ def update_tracking(order_id):
 @admin.route('/categories')
 @login_required
 def categories():
-    page = request.args.get('page', 1, type=int)
     search = request.args.get('search', '')
 
-    query = Category.query
-
-    if search:
-        query = query.filter(Category.name_en.contains(search) | Category.name_id.contains(search))
-
-    categories = query.order_by(Category.created_at.desc()).paginate(
-        page=page, per_page=10, error_out=False
-    )
+    categories = keyset_paginate(queries.categories_with_product_counts(search),
+                                 Category.created_at, Category.id,
+                                 after=request.args.get('after'), before=request.args.get('before'))
 
     return render_template('admin/categories.html', categories=categories, search=search)
 
 @admin.route('/categories/add', methods=['GET', 'POST'])
 @login_required
+@retry_on_busy
 def add_category():
     if request.method == 'POST':
         try:
@@ -372,6 +425,7 @@ def add_category():
 
             db.session.add(category)
             db.session.commit()
+            bump_catalog_version()
 
             flash('Category added successfully!', 'success')
             return redirect(url_for('admin.categories'))
@@ -383,6 +437,7 @@ def add_category():
 
 @admin.route('/categories/edit/<int:category_id>', methods=['GET', 'POST'])
 @login_required
+@retry_on_busy
 def edit_category(category_id):
     category = Category.query.get_or_404(category_id)
 
@@ -393,7 +448,10 @@ def edit_category(category_id):
             category.description_en = sanitize_text(request.form.get('description_en', ''))
             category.description_id = sanitize_text(request.form.get('description_id', ''))
 
+            db.session.flush()
+            search_index.reindex_category(category)
             db.session.commit()
+            bump_catalog_version()
 
             flash('Category updated successfully!', 'success')
             return redirect(url_for('admin.categories'))
@@ -406,20 +464,74 @@ def edit_category(category_id):
 
 @admin.route('/categories/delete/<int:category_id>')
 @login_required
+@retry_on_busy
 def delete_category(category_id):
     category = Category.query.get_or_404(category_id)
 
     # Check if category has products
-    if category.products:
+    if queries.category_has_products(category.id):
         flash('Cannot delete category with existing products!', 'error')
         return redirect(url_for('admin.categories'))
 
     db.session.delete(category)
     db.session.commit()
+    bump_catalog_version()
 
     flash('Category deleted successfully!', 'success')
     return redirect(url_for('admin.categories'))
 
+@admin.route('/analytics')
+@login_required
+def analytics_report():
+    today = date.today()
+    try:
+        end = date.fromisoformat(request.args['end']) if request.args.get('end') else today
+        start = date.fromisoformat(request.args['start']) if request.args.get('start') else end - timedelta(days=89)
+    except ValueError:
+        flash('Invalid date range, showing the last 90 days', 'warning')
+        end, start = today, today - timedelta(days=89)
+    if start > end:
+        start, end = end, start
+
+    interval = request.args.get('interval', 'week')
+    if interval not in analytics.INTERVALS:
+        interval = 'week'
+
+    report = analytics.sales_report(start, end, interval)
+    if request.args.get('format') == 'json':
+        return jsonify(analytics.report_json(report))
+    return render_template('admin/analytics.html', report=report)
+
+@admin.route('/exchange-rates', methods=['GET', 'POST'])
+@login_required
+@retry_on_busy
+def exchange_rates_view():
+    if request.method == 'POST':
+        try:
+            if request.form.get('action') == 'feed':
+                source = app.config['EXCHANGE_RATE_FEED']
+                entries = exchange_rates.update_rates(source)
+                message = f'Loaded {len(entries)} rates from {source}'
+            else:
+                effective = request.form.get('effective_date')
+                entry = exchange_rates.set_rate(
+                    request.form.get('currency', ''), request.form.get('rate'),
+                    date.fromisoformat(effective) if effective else None,
+                    source=f'admin:{current_user.username}')
+                message = f'1 {entry.currency} = Rp {entry.rate:,.2f} from {entry.effective_date}'
+            db.session.commit()
+            exchange_rates.rates_changed()
+            flash(message, 'success')
+        except (OSError, ValueError, KeyError) as e:
+            db.session.rollback()
+            flash(f'Exchange rate not saved: {str(e)}', 'error')
+        return redirect(url_for('admin.exchange_rates_view'))
+
+    return render_template('admin/exchange_rates.html',
+                           rates=exchange_rates.current_rates(),
+                           history=exchange_rates.rate_history(),
+                           feed=app.config['EXCHANGE_RATE_FEED'])
+
 @admin.route('/settings', methods=['GET', 'POST'])
 @login_required
 def settings():
@@ -430,24 +542,16 @@ def settings():
         db.session.commit()
 
     if request.method == 'POST':
-        create_upload_folder()
-
         # Handle logo upload
+        old_logo_url = settings.logo_url
         logo_url = settings.logo_url or ''
-        if 'logo_file' in request.files:
-            file = request.files['logo_file']
-            if file and file.filename != '' and allowed_file(file.filename):
-                # Delete old logo if it exists and is not a URL
-                if settings.logo_url and settings.logo_url.startswith('/static/uploads/'):
-                    old_file_path = settings.logo_url[1:]  # Remove leading slash
-                    if os.path.exists(old_file_path):
-                        os.remove(old_file_path)
-
-                filename = secure_filename(file.filename)
-                unique_filename = f"logo_{uuid.uuid4().hex}_{filename}"
-                file_path = os.path.join(UPLOAD_FOLDER, unique_filename)
-                file.save(file_path)
-                logo_url = f"/static/uploads/{unique_filename}"
+        try:
+            uploaded_url = images.save_upload(request.files.get('logo_file'))
+        except images.UploadRejected as e:
+            flash(f'Logo not saved: {str(e)}', 'error')
+            uploaded_url = None
+        if uploaded_url:
+            logo_url = uploaded_url
 
         # Handle gallery images upload (max 5 images)
         gallery_files = request.files.getlist('gallery_files')
@@ -463,13 +567,14 @@ def settings():
         max_new_images = 5 - existing_gallery_count
 
         if max_new_images > 0:
-            for i, file in enumerate(gallery_files[:max_new_images]):
-                if file and file.filename:
-                    filename = secure_filename(file.filename)
-                    unique_filename = f"{uuid.uuid4().hex}_{filename}"
-                    file_path = os.path.join(UPLOAD_FOLDER, unique_filename)
-                    file.save(file_path)
-                    gallery_urls.append(f"/static/uploads/{unique_filename}")
+            for file in gallery_files[:max_new_images]:
+                try:
+                    uploaded_url = images.save_upload(file)
+                except images.UploadRejected as e:
+                    flash(f'Gallery image not saved: {str(e)}', 'warning')
+                    continue
+                if uploaded_url:
+                    gallery_urls.append(uploaded_url)
 
             if gallery_urls:
                 if settings.gallery_images:
@@ -520,6 +625,11 @@ def settings():
         settings.gallery_mode = request.form.get('gallery_mode', 'static')
 
         db.session.commit()
+        invalidate_settings()
+        bump_catalog_version()
+        build_stylesheet(settings)
+        if old_logo_url and old_logo_url != logo_url:
+            images.schedule_gc()  # the replaced logo may be unused now
 
         flash('Settings updated successfully!', 'success')
         return redirect(url_for('admin.settings'))
@@ -528,6 +638,7 @@ def settings():
 
 @admin.route('/settings/remove-gallery-image', methods=['POST'])
 @login_required
+@retry_on_busy
 def remove_gallery_image():
     settings = CompanySettings.query.first()
     if not settings:
@@ -547,13 +658,11 @@ def remove_gallery_image():
         gallery_list.remove(image_url)
         settings.gallery_images = ','.join(gallery_list)
 
-        # Delete physical file if it exists
-        if image_url.startswith('/static/uploads/'):
-            file_path = image_url[1:]  # Remove leading slash
-            if os.path.exists(file_path):
-                os.remove(file_path)
-
         db.session.commit()
+        invalidate_settings()
+        bump_catalog_version()
+        build_stylesheet(settings)  # the first gallery image is the background
+        images.schedule_gc()  # the file goes once nothing else shows it
         flash('Gallery image removed successfully!', 'success')
     else:
         flash('Image not found in gallery', 'error')
@@ -0,0 +1,218 @@
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import case, func
+from app import app, db
+from models import Product, Order, OrderItem, DailyProductSales
+from page_cache import PageCache
+from database import increment_row
+
+# Sales analytics for the admin panel. Every report is a handful of GROUP BY
+# queries restricted to a date range, with the time bucket computed in SQL,
+# so the database returns one row per bucket rather than one per order.
+# Order-level figures read the order table through the covering
+# ix_order_sales index; item-level figures (volume, top products) read
+# daily_product_sales, a rollup of order_item per order day, product and
+# currency that dashboard_stats keeps current as orders change status.
+# Reports are cached per range for ANALYTICS_CACHE_TTL seconds.
+INTERVALS = ('day', 'week', 'month')
+CURRENCIES = ('USD', 'IDR')
+
+# Orders the shop has accepted; pending and cancelled ones are not sales
+SALES_STATUSES = ('confirmed', 'shipped', 'delivered')
+
+TOP_LIMIT = 10
+DEFAULT_CACHE_TTL = 300
+DEFAULT_CACHE_SIZE = 64
+
+_report_cache = PageCache()
+
+def bucket_expression(column, interval):
+    """SQL expression truncating a timestamp to the start of its day, week (Monday) or month"""
+    if db.engine.dialect.name == 'postgresql':
+        return func.date_trunc(interval, column)
+    if interval == 'week':
+        return func.date(column, '-6 days', 'weekday 1')
+    if interval == 'month':
+        return func.strftime('%Y-%m-01', column)
+    return func.date(column)
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value
+
+def _per_currency(amount_column):
+    """One SUM(...) column per currency, in CURRENCIES order"""
+    currency = func.coalesce(Order.currency, 'USD')
+    return [func.sum(case((currency == code, amount_column), else_=0)) for code in CURRENCIES]
+
+def _money(values):
+    return {code: round(float(value or 0), 2) for code, value in zip(CURRENCIES, values)}
+
+def _sales_filter(start, end):
+    return (Order.status.in_(SALES_STATUSES),
+            Order.created_at >= datetime.combine(start, time.min),
+            Order.created_at < datetime.combine(end + timedelta(days=1), time.min))
+
+def _apply_to_rollup(order, sign):
+    """Add (+1) or remove (-1) an order's items in the daily product sales rollup"""
+    day = (order.created_at or datetime.utcnow()).date()
+    for item in order.items:
+        increment_row(DailyProductSales,
+                      {'day': day, 'product_id': item.product_id, 'currency': order.currency or 'USD'},
+                      quantity=sign * item.quantity,
+                      revenue=sign * float(item.total_price or 0),
+                      order_count=sign)
+
+def record_order_placed(order):
+    if order.status in SALES_STATUSES:
+        _apply_to_rollup(order, 1)
+
+def record_status_change(order, old_status):
+    was_sale = old_status in SALES_STATUSES
+    is_sale = order.status in SALES_STATUSES
+    if was_sale != is_sale:
+        _apply_to_rollup(order, 1 if is_sale else -1)
+
+def rebuild_product_sales_statement():
+    """INSERT ... SELECT filling daily_product_sales from order and order_item"""
+    day = func.date(Order.created_at)
+    currency = func.coalesce(Order.currency, 'USD')
+    return db.insert(DailyProductSales).from_select(
+        ['day', 'product_id', 'currency', 'quantity', 'revenue', 'order_count'],
+        db.select(day, OrderItem.product_id, currency, func.sum(OrderItem.quantity),
+                  func.sum(OrderItem.total_price), func.count(OrderItem.id))
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(Order.status.in_(SALES_STATUSES))
+        .group_by(day, OrderItem.product_id, currency)
+    )
+
+def rebuild_product_sales():
+    db.session.execute(db.delete(DailyProductSales))
+    db.session.execute(rebuild_product_sales_statement())
+    clear_cache()
+
+def revenue_series(start, end, interval):
+    """Orders and revenue per bucket, split into domestic and international"""
+    bucket = bucket_expression(Order.created_at, interval)
+    rows = db.session.execute(
+        db.select(bucket, Order.is_international, func.count(Order.id), *_per_currency(Order.total_amount))
+        .where(*_sales_filter(start, end))
+        .group_by(bucket, Order.is_international)
+        .order_by(bucket)
+    ).all()
+
+    series = {}
+    for row in rows:
+        point = series.setdefault(_as_date(row[0]), {
+            'orders': 0,
+            'revenue': dict.fromkeys(CURRENCIES, 0.0),
+            'domestic': {'orders': 0, 'revenue': dict.fromkeys(CURRENCIES, 0.0)},
+            'international': {'orders': 0, 'revenue': dict.fromkeys(CURRENCIES, 0.0)},
+        })
+        revenue = _money(row[3:])
+        split = point['international' if row[1] else 'domestic']
+        point['orders'] += row[2]
+        split['orders'] += row[2]
+        for code, amount in revenue.items():
+            point['revenue'][code] = round(point['revenue'][code] + amount, 2)
+            split['revenue'][code] = round(split['revenue'][code] + amount, 2)
+    return [dict(bucket=bucket_start, **point) for bucket_start, point in sorted(series.items())]
+
+def volume_series(start, end, interval):
+    """Quantity sold per bucket and product unit (kg, bundle, ...)"""
+    bucket = bucket_expression(DailyProductSales.day, interval)
+    rows = db.session.execute(
+        db.select(bucket, Product.unit, func.sum(DailyProductSales.quantity))
+        .join(Product, Product.id == DailyProductSales.product_id)
+        .where(DailyProductSales.day.between(start, end))
+        .group_by(bucket, Product.unit)
+        .order_by(bucket)
+    ).all()
+
+    series = {}
+    for bucket_start, unit, quantity in rows:
+        if quantity:
+            series.setdefault(_as_date(bucket_start), {})[unit or 'unit'] = int(quantity)
+    return [{'bucket': bucket_start, 'quantity': units} for bucket_start, units in sorted(series.items())]
+
+def top_products(start, end, limit=TOP_LIMIT):
+    """Best-selling products by quantity over the range"""
+    quantity = func.sum(DailyProductSales.quantity)
+    revenue = [func.sum(case((DailyProductSales.currency == code, DailyProductSales.revenue), else_=0))
+               .label(f'revenue_{code.lower()}') for code in CURRENCIES]
+    # Aggregate the rollup first, then look up names for the top rows only
+    totals = (
+        db.select(DailyProductSales.product_id.label('product_id'),
+                  quantity.label('quantity'),
+                  func.sum(DailyProductSales.order_count).label('orders'),
+                  *revenue)
+        .where(DailyProductSales.day.between(start, end))
+        .group_by(DailyProductSales.product_id)
+        .having(quantity > 0)
+        .order_by(quantity.desc())
+        .limit(limit)
+        .subquery()
+    )
+    rows = db.session.execute(
+        db.select(totals, Product.name_en, Product.unit)
+        .join(Product, Product.id == totals.c.product_id)
+        .order_by(totals.c.quantity.desc())
+    ).all()
+    return [{
+        'product_id': row.product_id,
+        'name': row.name_en,
+        'unit': row.unit,
+        'quantity': int(row.quantity or 0),
+        'orders': int(row.orders or 0),
+        'revenue': _money([getattr(row, f'revenue_{code.lower()}') for code in CURRENCIES]),
+    } for row in rows]
+
+def top_countries(start, end, limit=TOP_LIMIT):
+    """Customer countries with the most orders over the range"""
+    orders = func.count(Order.id)
+    rows = db.session.execute(
+        db.select(Order.customer_country, orders, *_per_currency(Order.total_amount))
+        .where(*_sales_filter(start, end))
+        .group_by(Order.customer_country)
+        .order_by(orders.desc())
+        .limit(limit)
+    ).all()
+    return [{'country': row[0], 'orders': row[1], 'revenue': _money(row[2:])} for row in rows]
+
+def sales_report(start, end, interval='week'):
+    """All analytics for an inclusive date range, served from cache when fresh"""
+    if interval not in INTERVALS:
+        raise ValueError(f"interval must be one of {', '.join(INTERVALS)}")
+
+    key = (start, end, interval)
+    ttl = app.config.get('ANALYTICS_CACHE_TTL', DEFAULT_CACHE_TTL)
+    report = _report_cache.get(key, ttl)
+    if report is None:
+        report = {
+            'start': start,
+            'end': end,
+            'interval': interval,
+            'currencies': CURRENCIES,
+            'revenue': revenue_series(start, end, interval),
+            'volume': volume_series(start, end, interval),
+            'top_products': top_products(start, end),
+            'top_countries': top_countries(start, end),
+            'generated_at': datetime.utcnow(),
+        }
+        _report_cache.set(key, report, app.config.get('ANALYTICS_CACHE_SIZE', DEFAULT_CACHE_SIZE))
+    return report
+
+def report_json(report):
+    """The report with dates as ISO strings, for jsonify"""
+    if isinstance(report, dict):
+        return {key: report_json(value) for key, value in report.items()}
+    if isinstance(report, (list, tuple)):
+        return [report_json(value) for value in report]
+    if isinstance(report, (date, datetime)):
+        return report.isoformat()
+    return report
+
+def clear_cache():
+    _report_cache.clear()
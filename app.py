@@ -1,11 +1,15 @@
 import os
+import time
 import logging
+import click
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
 
+_started = time.perf_counter()
+
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
 
@@ -19,11 +23,33 @@ app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "banana-export-secret-key")
 app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
 
-# Configure SQLite database
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///banana_export.db"
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_pre_ping": True,
-}
+# Configure database (SQLite unless DATABASE_URL is set; pooled for PostgreSQL)
+from database import configure_database, configure_sqlite
+configure_database()
+# Connection pragmas for SQLite: "production" (WAL) or "default"
+app.config["SQLITE_PROFILE"] = os.environ.get("SQLITE_PROFILE", "production")
+app.config["SQLITE_WRITE_RETRIES"] = int(os.environ.get("SQLITE_WRITE_RETRIES", 3))
+# Exchange-rate feed for `flask update-rates` (JSON feed or CSV; path or URL)
+app.config["EXCHANGE_RATE_FEED"] = os.environ.get("EXCHANGE_RATE_FEED", "exchange_rates.json")
+
+# Where carts are kept: "session" (the signed cookie) or "database"
+app.config["CART_STORE"] = os.environ.get("CART_STORE", "session")
+app.config["CART_TTL_DAYS"] = int(os.environ.get("CART_TTL_DAYS", 30))
+
+# Threads per worker that resize uploaded images (needs Pillow)
+app.config["IMAGE_WORKERS"] = int(os.environ.get("IMAGE_WORKERS", 2))
+# Seconds before an image without variants is looked up in the media store again
+app.config["IMAGE_VARIANT_RECHECK_SECONDS"] = int(os.environ.get("IMAGE_VARIANT_RECHECK_SECONDS", 60))
+# Media storage for uploads: "local" (static/uploads) or "s3" (S3 or an S3-compatible server)
+app.config["MEDIA_STORAGE"] = os.environ.get("MEDIA_STORAGE", "local")
+app.config["MEDIA_S3_BUCKET"] = os.environ.get("MEDIA_S3_BUCKET")
+app.config["MEDIA_S3_ENDPOINT"] = os.environ.get("MEDIA_S3_ENDPOINT")
+app.config["MEDIA_URL"] = os.environ.get("MEDIA_URL")
+# Unreferenced media younger than this is kept (uploads not committed yet)
+app.config["MEDIA_GC_GRACE_SECONDS"] = int(os.environ.get("MEDIA_GC_GRACE_SECONDS", 6 * 3600))
+# Upload limits: per request (Flask answers 413 beyond it) and per image
+app.config["MAX_CONTENT_LENGTH"] = int(os.environ.get("MAX_UPLOAD_REQUEST_MB", 32)) * 1024 * 1024
+app.config["MAX_IMAGE_UPLOAD_SIZE"] = int(os.environ.get("MAX_IMAGE_UPLOAD_MB", 10)) * 1024 * 1024
 
 # Initialize extensions
 db.init_app(app)
@@ -31,15 +57,14 @@ login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'admin.login'
 
+# SQLite connection pragmas (WAL, busy timeout, ...); no-op for other backends
+configure_sqlite()
+
 @login_manager.user_loader
 def load_user(user_id):
     from models import Admin
     return Admin.query.get(int(user_id))
 
-# Import routes
-from routes import *
-from admin_routes import *
-
 # Add custom template filters
 @app.template_filter('nl2br')
 def nl2br_filter(text):
@@ -48,34 +73,196 @@ def nl2br_filter(text):
         return ''
     return text.replace('\n', '<br>\n')
 
+def create_app():
+    """Register the routes and return the application; safe to call more than once.
+
+    Importing this module only configures Flask and the extensions, so
+    scripts that just need the models and a database session skip the
+    route modules. The schema is not touched here: run `flask init-db`
+    once per deployment instead of on every worker start.
+    """
+    if 'admin' not in app.blueprints:
+        routes_started = time.perf_counter()
+        import routes  # noqa: F401 - registers the public routes
+        import admin_routes  # noqa: F401 - registers the admin blueprint
+        import assets  # noqa: F401 - fingerprinted, precompressed static files
+        finished = time.perf_counter()
+        app.config['STARTUP_TIMINGS'] = {
+            'configure_ms': round((routes_started - _started) * 1000, 1),
+            'routes_ms': round((finished - routes_started) * 1000, 1),
+            'total_ms': round((finished - _started) * 1000, 1),
+        }
+        app.logger.info("Start-up: app configured in %(configure_ms)sms, "
+                        "routes registered in %(routes_ms)sms, total %(total_ms)sms",
+                        app.config['STARTUP_TIMINGS'])
+        _warn_missing_packages()
+    return app
+
+def _warn_missing_packages():
+    """Log features that are off because an optional package is not installed"""
+    import images
+    if not images.pillow_available():
+        app.logger.warning("Pillow is not installed: uploaded images keep their EXIF/GPS "
+                           "metadata and get no resized variants (pip install Pillow)")
+    import exports
+    if not exports.xlsx_available():
+        app.logger.warning("openpyxl is not installed: order exports are CSV only (pip install openpyxl)")
+    import media_storage
+    if app.config.get('MEDIA_STORAGE') == 's3' and media_storage.boto3 is None:
+        app.logger.warning("MEDIA_STORAGE is 's3' but boto3 is not installed: "
+                           "image uploads will fail (pip install boto3)")
+
 def init_database():
-    """Initialize database with error handling"""
-    try:
-        with app.app_context():
-            # Import models to ensure tables are created
-            import models
-
-            # Create all tables
-            db.create_all()
-            print("✓ SQLite database tables created")
-
-            # Create default admin user if none exists
-            from models import Admin
-            from werkzeug.security import generate_password_hash
-
-            if not Admin.query.first():
-                admin = Admin(
-                    username='admin',
-                    email='admin@bananaexport.com',
-                    password_hash=generate_password_hash('admin123')
-                )
-                db.session.add(admin)
-                db.session.commit()
-                print("✓ Default admin created: username=admin, password=admin123")
+    """Create tables, apply migrations, build the search index and the default admin"""
+    started = time.perf_counter()
+    with app.app_context():
+        # Import models to ensure tables are created
+        import models  # noqa: F401
+
+        # Create all tables
+        db.create_all()
+        print("✓ Database tables created")
+
+        # Bring tables created by older versions up to date
+        from migrations import upgrade
+        for version in upgrade():
+            print(f"✓ Applied schema migration {version}")
+
+        from search_index import ensure_search_index
+        if ensure_search_index():
+            print("✓ Product search index built")
+
+        # Create default admin user if none exists
+        from models import Admin
+        from werkzeug.security import generate_password_hash
+
+        if not Admin.query.first():
+            admin = Admin(
+                username='admin',
+                email='admin@bananaexport.com',
+                password_hash=generate_password_hash('admin123')
+            )
+            db.session.add(admin)
+            db.session.commit()
+            print("✓ Default admin created: username=admin, password=admin123")
 
+        from dashboard_stats import reconcile
+        reconcile()
+        db.session.commit()
+        print("✓ Dashboard statistics reconciled")
+
+    print(f"✓ Database ready in {(time.perf_counter() - started) * 1000:.0f}ms")
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create or upgrade the database schema (run once per deployment)."""
+    try:
+        init_database()
     except Exception as e:
-        print(f" Database initialization failed: {e}")
-        print("Using minimal configuration...")
+        raise click.ClickException(f"Database initialization failed: {e}")
+
+@app.cli.command('reconcile-stats')
+def reconcile_stats_command():
+    """Rebuild the dashboard statistics from the order and product tables."""
+    from dashboard_stats import reconcile
+    stats = reconcile()
+    db.session.commit()
+    print(f"✓ Dashboard statistics reconciled: {stats.total_products} products, "
+          f"{stats.total_orders} orders, {stats.pending_orders} pending")
+
+@app.cli.command('import-products')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--dry-run', is_flag=True, help='Validate the file without writing anything.')
+def import_products_command(path, dry_run):
+    """Create or update products from a CSV or JSON price list."""
+    from product_import import read_rows, import_products
+    from page_cache import bump_catalog_version
+
+    started = time.perf_counter()
+    with open(path, 'rb') as stream:
+        try:
+            result = import_products(read_rows(stream, path), dry_run=dry_run)
+        except (ValueError, UnicodeDecodeError) as e:
+            raise click.ClickException(f"Could not read {path}: {e}")
+    for row_number, message in result.errors:
+        print(f"  row {row_number}: {message}")
+    if not dry_run:
+        db.session.commit()
+        bump_catalog_version()
+    verb = 'would be' if dry_run else 'were'
+    print(f"✓ {result.rows} rows in {time.perf_counter() - started:.1f}s: {result.inserted} products {verb} "
+          f"created, {result.updated} {verb} updated, {len(result.errors)} rows skipped")
+
+@app.cli.command('update-rates')
+@click.argument('source', required=False)
+def update_rates_command(source):
+    """Store exchange rates from a feed or file (default: EXCHANGE_RATE_FEED)."""
+    from exchange_rates import update_rates, rates_changed
+    source = source or app.config['EXCHANGE_RATE_FEED']
+    try:
+        entries = update_rates(source)
+    except (OSError, ValueError, KeyError) as e:
+        raise click.ClickException(f"Could not read rates from {source}: {e}")
+    db.session.commit()
+    rates_changed()
+    for entry in entries:
+        print(f"✓ 1 {entry.currency} = Rp {entry.rate:,.2f} from {entry.effective_date}")
+
+@app.cli.command('purge-carts')
+def purge_carts_command():
+    """Delete server-side carts unused for CART_TTL_DAYS."""
+    from cart_store import purge_expired_carts
+    purged = purge_expired_carts()
+    db.session.commit()
+    print(f"✓ Deleted {purged} expired carts")
+
+@app.cli.command('process-images')
+def process_images_command():
+    """Move uploads to content-hash names and generate missing image variants."""
+    import images
+    from media_storage import storage
+    from models import Product, CompanySettings
+    from settings_cache import invalidate_settings
+    from page_cache import bump_catalog_version
+
+    renamed = set()
+    def adopt(url):
+        new_url, filename = images.adopt_upload(url)
+        if filename:
+            renamed.add(filename)
+        return new_url
+
+    for product in Product.query.filter(Product.image_url.like(storage().url('%'))):
+        product.image_url = adopt(product.image_url)
+    for settings in CompanySettings.query.all():
+        settings.logo_url = adopt(settings.logo_url)
+        if settings.gallery_images:
+            settings.gallery_images = ','.join(adopt(url) for url in settings.gallery_list)
+    db.session.commit()
+    invalidate_settings()
+    bump_catalog_version()
+    print(f"✓ {len(renamed)} uploads stored under content-hash names (run gc-media to drop the old copies)")
+
+    if not images.pillow_available():
+        print("  ⚠ Pillow is not installed; no variants generated")
+        return
+    hashed = {name for name in images.referenced_names() if images.is_hashed_upload(storage().url(name))}
+    started = time.perf_counter()
+    images.wait_for_variants([images.submit_variants(name) for name in sorted(hashed)])
+    print(f"✓ Variants ready for {len(hashed)} images in {time.perf_counter() - started:.1f}s")
+
+@app.cli.command('gc-media')
+def gc_media_command():
+    """Delete stored images that no product or setting refers to."""
+    from images import collect_garbage
+    started = time.perf_counter()
+    deleted = collect_garbage()
+    print(f"✓ Deleted {deleted} unreferenced media objects in {time.perf_counter() - started:.1f}s")
 
-# Initialize database when module is imported
-init_database()
\ No newline at end of file
+@app.cli.command('collect-static')
+def collect_static_command():
+    """Fingerprint and precompress the static files (run on every deployment)."""
+    from assets import collect_static, brotli
+    manifest = collect_static()
+    print(f"✓ {len(manifest)} static files fingerprinted into static/dist"
+          f" with gzip{' and brotli' if brotli else ''} copies")
@@ -0,0 +1,167 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+import tempfile
+from flask import request, send_file
+from werkzeug.security import safe_join
+from app import app
+
+try:
+    import brotli
+except ImportError:  # Brotli variants are optional; gzip always works
+    brotli = None
+
+# Fingerprinted static assets. `flask collect-static` copies every file under
+# static/ (except uploads, which media_storage names by content already) to
+# static/dist/ under a name carrying a hash of its content, writes gzip and,
+# with the brotli package, brotli copies of the text files next to it, and
+# records source -> fingerprinted name in static/dist/manifest.json.
+#
+# With a manifest present, url_for('static', filename='css/style.css') links
+# the fingerprinted copy, which is served with a year-long immutable
+# Cache-Control and, when the browser accepts it, precompressed. Files the
+# manifest does not know (or every file, before the first collect) are
+# served as before. Run collect-static again whenever static files change.
+#
+# Directories in CONTENT_HASHED_DIRS hold files the app itself writes under
+# content-hash names (the theme stylesheets from themes.py); they are served
+# the same way without going through the manifest.
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+CONTENT_HASHED_DIRS = ('themes',)
+SKIP_DIRS = {DIST_DIR, 'uploads', *CONTENT_HASHED_DIRS}
+FINGERPRINT_LENGTH = 12
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Accept-Encoding token, file suffix; best first
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+_manifest = {}
+_fingerprinted = frozenset()
+
+def _dist_folder():
+    return os.path.join(app.static_folder, DIST_DIR)
+
+def _compressible(filename):
+    mimetype = mimetypes.guess_type(filename)[0] or ''
+    return mimetype.startswith(COMPRESSIBLE_TYPES)
+
+def write_file(path, data):
+    """Write a file under a temporary name and move it in, so readers never see part of it"""
+    handle = tempfile.NamedTemporaryFile(dir=os.path.dirname(path), suffix='.part', delete=False)
+    try:
+        with handle:
+            handle.write(data)
+        os.chmod(handle.name, 0o644)  # mkstemp creates files readable by the owner only
+        os.replace(handle.name, path)
+    finally:
+        if os.path.exists(handle.name):
+            os.remove(handle.name)
+
+def write_compressed(path, data):
+    """Write .gz (and .br) copies of a file where they come out smaller"""
+    written = []
+    compressed = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(compressed) < len(data):
+        write_file(path + '.gz', compressed)
+        written.append(path + '.gz')
+    if brotli is not None:
+        compressed = brotli.compress(data)
+        if len(compressed) < len(data):
+            write_file(path + '.br', compressed)
+            written.append(path + '.br')
+    return written
+
+def collect_static():
+    """Fingerprint and precompress the static files; returns the manifest"""
+    source_root = app.static_folder
+    dist = _dist_folder()
+    staging = dist + '.new'
+    shutil.rmtree(staging, ignore_errors=True)
+
+    manifest = {}
+    for directory, subdirectories, filenames in os.walk(source_root):
+        if directory == source_root:
+            subdirectories[:] = [name for name in subdirectories
+                                 if name not in SKIP_DIRS and not name.startswith(DIST_DIR + '.')]
+        for filename in sorted(filenames):
+            source = os.path.join(directory, filename)
+            relative = os.path.relpath(source, source_root).replace(os.sep, '/')
+            with open(source, 'rb') as handle:
+                data = handle.read()
+            stem, extension = os.path.splitext(relative)
+            fingerprinted = f'{stem}.{hashlib.sha256(data).hexdigest()[:FINGERPRINT_LENGTH]}{extension}'
+
+            target = os.path.join(staging, fingerprinted)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as handle:
+                handle.write(data)
+            if _compressible(filename):
+                write_compressed(target, data)
+            manifest[relative] = fingerprinted
+
+    os.makedirs(staging, exist_ok=True)
+    with open(os.path.join(staging, MANIFEST_NAME), 'w') as handle:
+        json.dump(manifest, handle, indent=2, sort_keys=True)
+
+    # Swap the new build in whole, so a running worker never sees half of it
+    previous = dist + '.old'
+    shutil.rmtree(previous, ignore_errors=True)
+    if os.path.exists(dist):
+        os.replace(dist, previous)
+    os.replace(staging, dist)
+    shutil.rmtree(previous, ignore_errors=True)
+
+    load_manifest()
+    return manifest
+
+def load_manifest():
+    """Read static/dist/manifest.json; without one static URLs stay unversioned"""
+    global _manifest, _fingerprinted
+    try:
+        with open(os.path.join(_dist_folder(), MANIFEST_NAME)) as handle:
+            manifest = json.load(handle)
+    except FileNotFoundError:
+        manifest = {}
+    _manifest = manifest
+    _fingerprinted = frozenset(f'{DIST_DIR}/{name}' for name in manifest.values())
+
+@app.url_defaults
+def fingerprint_static_urls(endpoint, values):
+    """Point url_for('static', ...) at the fingerprinted copy when there is one"""
+    if endpoint == 'static' and _manifest:
+        fingerprinted = _manifest.get(values.get('filename'))
+        if fingerprinted:
+            values['filename'] = f'{DIST_DIR}/{fingerprinted}'
+
+def serve_static(filename):
+    """Static files, with fingerprinted ones precompressed and cached for good"""
+    if filename not in _fingerprinted and filename.split('/', 1)[0] not in CONTENT_HASHED_DIRS:
+        return app.send_static_file(filename)
+
+    path = safe_join(app.static_folder, filename)
+    if path is None or not os.path.isfile(path):
+        return app.send_static_file(filename)  # the 404
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    accepted = request.accept_encodings
+    for encoding, suffix in ENCODINGS:
+        if accepted[encoding] and os.path.exists(path + suffix):
+            response = send_file(path + suffix, mimetype=mimetype, conditional=True)
+            response.content_encoding = encoding
+            break
+    else:
+        response = send_file(path, mimetype=mimetype, conditional=True)
+
+    response.vary.add('Accept-Encoding')
+    response.cache_control.no_cache = None
+    response.cache_control.public = True
+    response.cache_control.max_age = IMMUTABLE_MAX_AGE
+    response.cache_control.immutable = True
+    return response
+
+app.view_functions['static'] = serve_static
+load_manifest()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Timing check for the admin sales analytics.
+Fills a throwaway SQLite database with three years of orders (one million
+order items by default), reconciles the statistics and sales rollup, then
+times analytics.sales_report() for the whole range at each interval,
+uncached and cached.
+
+Usage: python benchmark_analytics.py [order_items]
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+from datetime import datetime, timedelta, date
+
+_db_dir = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_db_dir, 'analytics.db')}"
+
+import logging
+logging.disable(logging.CRITICAL)
+
+from app import app, db, init_database
+from models import Category, Product, Order, OrderItem
+import analytics
+import dashboard_stats
+
+ITEMS_PER_ORDER = 3
+DAYS = 3 * 365
+COUNTRIES = ['Indonesia', 'Japan', 'Singapore', 'Malaysia', 'Netherlands', 'United States',
+             'Australia', 'Germany', 'South Korea', 'United Arab Emirates', 'India', 'China']
+
+def seed(order_items):
+    random.seed(7)
+    category = Category(name_en='Banana Leaves', name_id='Daun Pisang')
+    db.session.add(category)
+    db.session.flush()
+    products = [Product(name_en=f'Banana Leaf {i}', name_id=f'Daun Pisang {i}',
+                        price_idr=35000, price_usd=35000 / 15300,
+                        unit=random.choice(['kg', 'bundle', 'sheet']),
+                        category_id=category.id, is_available=True)
+                for i in range(50)]
+    db.session.add_all(products)
+    db.session.commit()
+    product_ids = [product.id for product in products]
+
+    first_day = datetime.utcnow() - timedelta(days=DAYS)
+    order_count = order_items // ITEMS_PER_ORDER
+    batch = 20000
+    for offset in range(0, order_count, batch):
+        orders, items = [], []
+        for order_id in range(offset + 1, min(offset + batch, order_count) + 1):
+            country = random.choice(COUNTRIES)
+            currency = 'IDR' if country == 'Indonesia' else 'USD'
+            created_at = first_day + timedelta(seconds=random.randrange(DAYS * 86400))
+            total = 0
+            for _ in range(ITEMS_PER_ORDER):
+                quantity = random.randint(1, 50)
+                price = 35000 if currency == 'IDR' else 2.29
+                items.append({'order_id': order_id, 'product_id': random.choice(product_ids),
+                              'quantity': quantity, 'unit_price': price, 'total_price': price * quantity})
+                total += price * quantity
+            orders.append({'id': order_id, 'order_number': f'BENCH{order_id}', 'customer_name': 'Benchmark',
+                           'customer_email': 'bench@example.com', 'customer_country': country,
+                           'shipping_address': '-', 'total_amount': total, 'currency': currency,
+                           'status': random.choice(['pending', 'confirmed', 'shipped', 'delivered', 'cancelled']),
+                           'is_international': country != 'Indonesia', 'created_at': created_at,
+                           'updated_at': created_at})
+        db.session.execute(db.insert(Order), orders)
+        db.session.execute(db.insert(OrderItem), items)
+        db.session.commit()
+    return order_count
+
+def main():
+    order_items = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    init_database()
+
+    with app.app_context():
+        started = time.perf_counter()
+        orders = seed(order_items)
+        print(f"Seeded {orders:,} orders / {orders * ITEMS_PER_ORDER:,} items "
+              f"in {time.perf_counter() - started:.1f}s")
+
+        # Rows were bulk-inserted, so build the sales rollup the way
+        # `flask reconcile-stats` would
+        started = time.perf_counter()
+        dashboard_stats.reconcile()
+        db.session.execute(db.text('ANALYZE'))
+        db.session.commit()
+        print(f"Reconciled statistics in {time.perf_counter() - started:.1f}s")
+
+        end = date.today()
+        start = end - timedelta(days=DAYS)
+        for interval in analytics.INTERVALS:
+            analytics.clear_cache()
+            started = time.perf_counter()
+            report = analytics.sales_report(start, end, interval)
+            cold = time.perf_counter() - started
+            started = time.perf_counter()
+            analytics.sales_report(start, end, interval)
+            warm = time.perf_counter() - started
+            print(f"{interval:6} {len(report['revenue']):>5} buckets  "
+                  f"uncached {cold * 1000:>7.0f}ms  cached {warm * 1000:>5.2f}ms")
+
+if __name__ == '__main__':
+    main()
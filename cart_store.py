@@ -0,0 +1,144 @@
+import secrets
+from datetime import datetime, timedelta
+from flask import session, g
+from sqlalchemy.exc import OperationalError
+from app import app, db
+from database import is_busy_error
+from models import Cart
+
+# Shopping carts, {product id (str): quantity}. With CART_STORE = 'session'
+# (the default) the cart lives in the signed session cookie. With 'database'
+# the cookie only carries a random cart id and the lines are kept server-side
+# in the cart table as one compact "id:quantity,..." string, so a wholesale
+# cart with hundreds of lines doesn't ride along on every request.
+#
+# Either way the cart is loaded once per request and only written back when
+# it changed, so viewing pages never re-signs the cookie or updates the row.
+# Stored carts expire CART_TTL_DAYS after their last change or visit; `flask
+# purge-carts` deletes them. A visit pushes the expiry back from an
+# after-request hook on its own connection, since reading the cart must not
+# commit whatever the view has pending in its session.
+DEFAULT_CART_TTL_DAYS = 30
+
+# Stored carts still in use get their expiry pushed back at most this often
+TOUCH_INTERVAL = timedelta(days=1)
+
+def _database_store():
+    return app.config.get('CART_STORE', 'session') == 'database'
+
+def _expiry_cutoff():
+    return datetime.utcnow() - timedelta(days=app.config.get('CART_TTL_DAYS', DEFAULT_CART_TTL_DAYS))
+
+def encode_cart(cart):
+    """The compact "id:quantity,..." form of a cart"""
+    return ','.join(f'{product_id}:{quantity}' for product_id, quantity in cart.items())
+
+def decode_cart(items):
+    """A cart from its compact form, skipping malformed entries"""
+    cart = {}
+    for entry in (items or '').split(','):
+        product_id, _, quantity = entry.partition(':')
+        try:
+            quantity = int(quantity)
+        except ValueError:
+            continue
+        if product_id.isdigit() and quantity > 0:
+            cart[product_id] = quantity
+    return cart
+
+def _load_stored(cart_id):
+    entry = db.session.get(Cart, cart_id)
+    cart = decode_cart(entry.items) if entry and entry.updated_at >= _expiry_cutoff() else {}
+    if not cart:
+        # Forget a cart id with nothing behind it, so has_cart() stops
+        # keeping this visitor out of the page cache; purge_expired_carts()
+        # removes whatever row is left.
+        session.pop('cart_id', None)
+    elif datetime.utcnow() - entry.updated_at >= TOUCH_INTERVAL:
+        g.cart_touch = cart_id
+    return cart
+
+def _load():
+    cart_id = session.get('cart_id')
+    if _database_store() and cart_id:
+        return _load_stored(cart_id)
+    # A cookie cart, also picked up when switching to the database store
+    return dict(session.get('cart') or {})
+
+def get_cart():
+    """This visitor's cart as a new dict; change it and pass it to save_cart()"""
+    if 'cart' not in g:
+        g.cart = _load()
+    return dict(g.cart)
+
+def has_cart():
+    """True when the visitor may have a cart, without loading a stored one"""
+    return bool(session.get('cart') or session.get('cart_id'))
+
+def cart_quantity():
+    """Total quantity in the cart, for the navigation badge"""
+    return sum(get_cart().values()) if has_cart() else 0
+
+def save_cart(cart):
+    """Store the visitor's cart if it differs from the one loaded"""
+    cart = {product_id: quantity for product_id, quantity in cart.items() if quantity > 0}
+    if cart == get_cart():
+        return
+
+    if not _database_store():
+        if cart:
+            session['cart'] = cart
+        else:
+            session.pop('cart', None)
+    elif cart:
+        cart_id = session.get('cart_id') or secrets.token_urlsafe(16)
+        entry = db.session.get(Cart, cart_id)
+        if entry is None:
+            entry = Cart(id=cart_id)
+            db.session.add(entry)
+        entry.items = encode_cart(cart)
+        entry.updated_at = datetime.utcnow()
+        db.session.commit()
+        session['cart_id'] = cart_id
+        session.pop('cart', None)
+    else:
+        cart_id = session.pop('cart_id', None)
+        session.pop('cart', None)
+        if cart_id:
+            _delete_stored(cart_id)
+    g.cart = cart
+    g.pop('cart_touch', None)  # the row was just written or deleted
+
+def touch_stored_cart(response):
+    """Push back the expiry of a stored cart loaded during the request; an after_request hook"""
+    cart_id = g.pop('cart_touch', None)
+    if cart_id:
+        # Busy: the next visit tries again
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(db.update(Cart).where(Cart.id == cart_id).values(updated_at=datetime.utcnow()))
+        except OperationalError as error:
+            if not is_busy_error(error):
+                raise
+    return response
+
+def _delete_stored(cart_id):
+    # The session no longer refers to the cart, so a busy database only
+    # leaves the row for purge_expired_carts() instead of failing the
+    # request (which may already have committed an order).
+    try:
+        db.session.execute(db.delete(Cart).where(Cart.id == cart_id))
+        db.session.commit()
+    except OperationalError as error:
+        db.session.rollback()
+        if not is_busy_error(error):
+            raise
+
+def clear_cart():
+    save_cart({})
+
+def purge_expired_carts():
+    """Delete stored carts past CART_TTL_DAYS; returns how many"""
+    return db.session.execute(
+        db.delete(Cart).where(Cart.updated_at < _expiry_cutoff())
+    ).rowcount
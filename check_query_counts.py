@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+SQL statement-count check for the storefront and admin pages.
+Renders every listed route against a throwaway SQLite database, grows the
+catalog and order history, renders again, and fails if any route issued
+more statements the second time (i.e. it has an N+1 query).
+"""
+
+import os
+import sys
+import tempfile
+
+_db_dir = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_db_dir, 'query_counts.db')}"
+
+from sqlalchemy import event
+from app import create_app, init_database, db
+from models import Category, Product, Order, OrderItem
+
+app = create_app()
+
+statements = []
+
+def count_statement(conn, cursor, statement, parameters, context, executemany):
+    statements.append(statement)
+
+def seed(categories, products_per_category, order_items):
+    """Add categories and products, plus one order holding `order_items` lines"""
+    new_categories = [Category(name_en=f'Category {i}', name_id=f'Kategori {i}') for i in range(categories)]
+    db.session.add_all(new_categories)
+    db.session.flush()
+
+    new_products = []
+    for category in new_categories:
+        for i in range(products_per_category):
+            new_products.append(Product(
+                name_en=f'Banana Leaf {category.id}-{i}',
+                name_id=f'Daun Pisang {category.id}-{i}',
+                description_en='Fresh leaves',
+                description_id='Daun segar',
+                price_idr=35000,
+                price_usd=35000 / 15300,
+                category_id=category.id,
+                is_available=True
+            ))
+    db.session.add_all(new_products)
+    db.session.flush()
+
+    order = Order(
+        order_number=f'CHECK{Order.query.count() + 1}',
+        customer_name='Query Check',
+        customer_email='check@example.com',
+        customer_country='Indonesia',
+        shipping_address='Jakarta',
+        total_amount=0,
+        status='shipped',
+        shipping_status='in_transit'
+    )
+    db.session.add(order)
+    db.session.flush()
+    for product in new_products[:order_items]:
+        db.session.add(OrderItem(order_id=order.id, product_id=product.id, quantity=1,
+                                 unit_price=35000, total_price=35000))
+    db.session.commit()
+    return new_products[0].id, order.id
+
+def routes(product_id, order_id):
+    return [
+        '/',
+        '/products',
+        '/products?category=1',
+        f'/product/{product_id}',
+        '/cart',
+        '/checkout',
+        '/admin/dashboard',
+        '/admin/products',
+        '/admin/categories',
+        '/admin/orders',
+        f'/admin/orders/{order_id}',
+        '/admin/shipping',
+    ]
+
+def measure(client, product_id, order_id):
+    # Put every product in the cart so cart pricing is exercised at full size
+    with app.app_context():
+        cart = {str(product.id): 1 for product in Product.query.all()}
+    with client.session_transaction() as sess:
+        sess['cart'] = cart
+        sess['is_logged_in'] = True
+
+    counts = {}
+    for url in routes(product_id, order_id):
+        client.get(url)  # warm process-level caches
+        statements.clear()
+        response = client.get(url)
+        if response.status_code != 200:
+            raise RuntimeError(f'{url} returned {response.status_code}')
+        counts[url] = len(statements)
+    return counts
+
+def main():
+    init_database()
+
+    # Requests run outside any app context of our own so each one gets a
+    # fresh session and g, as it would in production.
+    client = app.test_client()
+    client.post('/admin/login', data={'username': 'admin', 'password': 'admin123'})
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', count_statement)
+        product_id, order_id = seed(categories=1, products_per_category=1, order_items=1)
+    small = measure(client, product_id, order_id)
+
+    with app.app_context():
+        seed(categories=6, products_per_category=8, order_items=40)
+        _, large_order_id = seed(categories=4, products_per_category=10, order_items=40)
+    # Same product page; the large order replaces the single-line one
+    large = measure(client, product_id, large_order_id)
+
+    failed = False
+    print(f"{'route':40} {'small':>6} {'large':>6}")
+    for url, large_url in zip(routes(product_id, order_id), routes(product_id, large_order_id)):
+        ok = large[large_url] <= small[url]
+        failed |= not ok
+        print(f"{large_url:40} {small[url]:>6} {large[large_url]:>6}  {'✓' if ok else '✗ N+1'}")
+
+    if failed:
+        print("Statement count grows with row count on the routes marked ✗")
+        sys.exit(1)
+    print("✓ All routes issue a constant number of statements")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+from datetime import datetime, date, timedelta
+from app import db
+from models import Product, Order, DashboardStats, DailyRevenue
+from database import increment_row
+import analytics
+
+# Materialized admin dashboard statistics. Write paths call the record_*
+# functions before committing, so the counters change in the same
+# transaction as the rows they count, and the dashboard reads one row by
+# primary key instead of scanning product and order. The same hooks keep
+# the analytics sales rollup current. reconcile() rebuilds everything from
+# the source tables; `flask reconcile-stats` runs it.
+STATS_ID = 1
+
+# Order statuses whose totals count as revenue on the dashboard
+REVENUE_STATUSES = ('confirmed',)
+
+def _bump(**deltas):
+    """Add to counters on the stats row with a single UPDATE"""
+    values = {name: getattr(DashboardStats, name) + delta for name, delta in deltas.items() if delta}
+    if values:
+        db.session.execute(db.update(DashboardStats).where(DashboardStats.id == STATS_ID).values(**values))
+
+def _order_day(order):
+    return (order.created_at or datetime.utcnow()).date()
+
+def _add_revenue(order, sign):
+    """Move an order into (+1) or out of (-1) its day's revenue bucket"""
+    amount = sign * float(order.total_amount or 0)
+    _bump(total_revenue=amount)
+
+    increment_row(DailyRevenue, {'day': _order_day(order), 'currency': order.currency or 'USD'},
+                  order_count=sign, revenue=amount)
+
+def record_order_placed(order):
+    _bump(total_orders=1, pending_orders=int(order.status == 'pending'))
+    if order.status in REVENUE_STATUSES:
+        _add_revenue(order, 1)
+    analytics.record_order_placed(order)
+
+def record_status_change(order, old_status):
+    """Call after changing order.status, with the status it had before"""
+    if old_status == order.status:
+        return
+    _bump(pending_orders=int(order.status == 'pending') - int(old_status == 'pending'))
+    was_revenue = old_status in REVENUE_STATUSES
+    is_revenue = order.status in REVENUE_STATUSES
+    if was_revenue != is_revenue:
+        _add_revenue(order, 1 if is_revenue else -1)
+    analytics.record_status_change(order, old_status)
+
+def record_products_added(count=1):
+    _bump(total_products=count)
+
+def record_products_deleted(count=1):
+    _bump(total_products=-count)
+
+def reconcile():
+    """Recompute the stats row, revenue buckets and sales rollup from product and order"""
+    day = db.func.date(Order.created_at)
+    currency = db.func.coalesce(Order.currency, 'USD')
+    revenue = Order.query.filter(Order.status.in_(REVENUE_STATUSES))
+
+    stats = db.session.get(DashboardStats, STATS_ID) or DashboardStats(id=STATS_ID)
+    stats.total_products = Product.query.count()
+    stats.total_orders = Order.query.count()
+    stats.pending_orders = Order.query.filter_by(status='pending').count()
+    stats.total_revenue = float(revenue.with_entities(db.func.sum(Order.total_amount)).scalar() or 0)
+    stats.reconciled_at = datetime.utcnow()
+    db.session.add(stats)
+
+    db.session.execute(db.delete(DailyRevenue))
+    rows = (revenue.with_entities(day, currency, db.func.count(Order.id), db.func.sum(Order.total_amount))
+            .group_by(day, currency).all())
+    db.session.add_all([
+        DailyRevenue(day=date.fromisoformat(bucket) if isinstance(bucket, str) else bucket,
+                     currency=bucket_currency, order_count=count, revenue=float(total or 0))
+        for bucket, bucket_currency, count, total in rows
+    ])
+    analytics.rebuild_product_sales()
+    db.session.flush()
+    return stats
+
+def get_dashboard_stats():
+    """The stats row, reconciled first if it has never been built"""
+    stats = db.session.get(DashboardStats, STATS_ID)
+    if stats is None:
+        stats = reconcile()
+        db.session.commit()
+    return stats
+
+def revenue_by_day(days=14):
+    """{currency: [(day, orders, revenue), ...]} for the last `days` days, oldest first"""
+    since = date.today() - timedelta(days=days - 1)
+    buckets = {}
+    for row in DailyRevenue.query.filter(DailyRevenue.day >= since).order_by(DailyRevenue.day):
+        buckets.setdefault(row.currency, []).append((row.day, row.order_count, row.revenue))
+    return buckets
+
+def revenue_by_month(months=12):
+    """{currency: [(first day of month, orders, revenue), ...]} for the last `months` months"""
+    today = date.today()
+    month_index = today.year * 12 + today.month - 1 - (months - 1)
+    since = date(month_index // 12, month_index % 12 + 1, 1)
+    buckets = {}
+    for row in DailyRevenue.query.filter(DailyRevenue.day >= since).order_by(DailyRevenue.day):
+        months_for_currency = buckets.setdefault(row.currency, {})
+        month = row.day.replace(day=1)
+        orders, revenue = months_for_currency.get(month, (0, 0.0))
+        months_for_currency[month] = (orders + row.order_count, revenue + row.revenue)
+    return {currency: [(month, orders, revenue) for month, (orders, revenue) in sorted(values.items())]
+            for currency, values in buckets.items()}
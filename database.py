@@ -0,0 +1,154 @@
+import os
+import re
+import time
+import random
+import sqlite3
+from functools import wraps
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import OperationalError
+from app import app, db
+
+# Connection pragmas per SQLITE_PROFILE. In WAL mode readers keep reading
+# while place_order or an admin edit commits, and a writer waits up to
+# busy_timeout ms for the write lock instead of failing with SQLITE_BUSY.
+# Any pragma can be overridden with SQLITE_<NAME>, e.g. SQLITE_MMAP_SIZE=0.
+SQLITE_PROFILES = {
+    'production': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',  # durable at checkpoints; safe with WAL
+        'busy_timeout': 5000,
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,  # negative = KiB, i.e. 64 MiB per connection
+        'temp_store': 'MEMORY',
+    },
+    # SQLite's own defaults, apart from waiting on locks instead of failing
+    'default': {
+        'busy_timeout': 5000,
+    },
+}
+
+PRAGMA_NAMES = ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size', 'cache_size', 'temp_store')
+
+DEFAULT_WRITE_RETRIES = 3
+DEFAULT_RETRY_BACKOFF = 0.05
+
+DEFAULT_DATABASE_URL = 'sqlite:///banana_export.db'
+
+# Connection pool for server databases, overridable per deployment. Each
+# worker process holds at most DB_POOL_SIZE + DB_MAX_OVERFLOW connections,
+# so size them against the server's max_connections divided by the number
+# of workers.
+POOL_SETTINGS = (
+    ('pool_size', 'DB_POOL_SIZE', int, 5),
+    ('max_overflow', 'DB_MAX_OVERFLOW', int, 10),
+    ('pool_timeout', 'DB_POOL_TIMEOUT', int, 30),
+    ('pool_recycle', 'DB_POOL_RECYCLE', int, 1800),
+)
+
+def database_url():
+    """DATABASE_URL from the environment, SQLite for development when unset"""
+    url = os.environ.get('DATABASE_URL') or DEFAULT_DATABASE_URL
+    # requirements.txt ships psycopg2; SQLAlchemy 2.1 would default to psycopg 3.
+    # Heroku-style postgres:// URLs are no longer accepted by SQLAlchemy at all.
+    for scheme in ('postgres://', 'postgresql://'):
+        if url.startswith(scheme):
+            url = 'postgresql+psycopg2://' + url[len(scheme):]
+    return url
+
+def engine_options(url):
+    """SQLAlchemy engine options for the backend the URL selects"""
+    if url.startswith('sqlite'):
+        # Connections are local files; the pragmas in configure_sqlite do the tuning
+        return {}
+    options = {'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', '1') != '0'}
+    for option, variable, convert, default in POOL_SETTINGS:
+        options[option] = convert(os.environ.get(variable, default))
+    return options
+
+def configure_database():
+    """Select the backend from the environment and size its connection pool"""
+    url = database_url()
+    app.config['SQLALCHEMY_DATABASE_URI'] = url
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options = engine_options(url)
+    if 'pool_size' in options:
+        app.logger.info("Database pool: %(pool_size)s connections + %(max_overflow)s overflow, "
+                        "recycled after %(pool_recycle)ss", options)
+
+def sqlite_pragmas(profile):
+    """Pragmas for a profile with any SQLITE_<NAME> environment overrides applied"""
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown SQLITE_PROFILE {profile!r}; expected one of {', '.join(SQLITE_PROFILES)}")
+    pragmas = dict(SQLITE_PROFILES[profile])
+    for name in PRAGMA_NAMES:
+        value = os.environ.get(f'SQLITE_{name.upper()}')
+        if value:
+            pragmas[name] = value
+    for name, value in pragmas.items():
+        if not re.fullmatch(r'-?\w+', str(value)):
+            raise ValueError(f"Invalid value for SQLite pragma {name}: {value!r}")
+    return pragmas
+
+def configure_sqlite():
+    """Apply the configured SQLite profile to every new connection of the engine"""
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+
+    pragmas = sqlite_pragmas(app.config.get('SQLITE_PROFILE', 'production'))
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            # journal_mode is a property of the database file, the rest are per connection
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name} = {value}')
+        finally:
+            cursor.close()
+
+def increment_row(model, keys, **increments):
+    """INSERT a counter row or add to the existing one, in one statement.
+
+    `keys` are the primary key values; `increments` are added to the
+    matching columns (and used as the starting values for a new row).
+    """
+    dialect = db.session.get_bind().dialect.name
+    insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+    statement = insert(model).values(**keys, **increments)
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={name: getattr(model, name) + getattr(statement.excluded, name) for name in increments}))
+
+def is_busy_error(error):
+    """True for SQLITE_BUSY / SQLITE_LOCKED surfaced through SQLAlchemy"""
+    return (isinstance(error, OperationalError)
+            and isinstance(error.orig, sqlite3.OperationalError)
+            and ('locked' in str(error.orig) or 'busy' in str(error.orig)))
+
+def retry_on_busy(view):
+    """Re-run a write view when SQLite reports the database busy.
+
+    busy_timeout covers ordinary lock waits; this handles the cases SQLite
+    refuses to wait on, such as a transaction that read first and then finds
+    another worker committed before it could take the write lock. The view
+    is rolled back and run again, so it must not have side effects before
+    its commit that cannot be repeated (file uploads, for example).
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        retries = app.config.get('SQLITE_WRITE_RETRIES', DEFAULT_WRITE_RETRIES)
+        backoff = app.config.get('SQLITE_RETRY_BACKOFF', DEFAULT_RETRY_BACKOFF)
+        for attempt in range(retries + 1):
+            try:
+                return view(*args, **kwargs)
+            except OperationalError as e:
+                if not is_busy_error(e) or attempt == retries:
+                    raise
+                db.session.rollback()
+                delay = backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+                app.logger.warning("Database busy in %s, retrying in %.0fms (%d/%d)",
+                               view.__name__, delay * 1000, attempt + 1, retries)
+                time.sleep(delay)
+    return wrapper
@@ -0,0 +1,200 @@
+import io
+import os
+import csv
+import json
+import math
+import threading
+import time
+from datetime import date, datetime
+from types import MappingProxyType
+from urllib.request import urlopen
+from app import app, db
+from models import ExchangeRate
+
+# Exchange rates against the Rupiah, the catalog's base currency. Each rate is
+# stored with the date it takes effect, so history is kept and a rate can be
+# entered ahead of time. The rates in effect today are cached per process as
+# one read-only mapping, like the company settings: pricing a page full of
+# products is a dict lookup per product, not a query. The worker that stores
+# a rate invalidates its cache immediately; other workers reload after
+# EXCHANGE_RATE_CACHE_TTL seconds.
+#
+# rates_stamp() describes the loaded rates (each rate with its effective
+# date, and when the newest took effect or was entered) for the catalog's
+# HTTP validators and page cache, so a changed rate, or a future-dated one
+# reaching its day, changes them without any catalog row being written.
+DEFAULT_RATE_CACHE_TTL = 300
+
+# Rates used for a currency until one is stored (IDR per unit)
+DEFAULT_RATES = MappingProxyType({'IDR': 1.0, 'USD': 15300.0})
+
+FEED_TIMEOUT = 10
+
+_lock = threading.Lock()
+_rates = None
+_stamp = None
+_loaded_at = 0.0
+_version = 0
+
+def _load_rates():
+    """({currency: rate} for the latest rate of each currency effective today, stamp)"""
+    latest = (
+        db.select(ExchangeRate.currency, db.func.max(ExchangeRate.effective_date).label('effective_date'))
+        .where(ExchangeRate.effective_date <= date.today())
+        .group_by(ExchangeRate.currency)
+        .subquery()
+    )
+    rows = db.session.execute(
+        db.select(ExchangeRate.currency, ExchangeRate.rate, ExchangeRate.effective_date, ExchangeRate.created_at)
+        .join(latest, (ExchangeRate.currency == latest.c.currency)
+              & (ExchangeRate.effective_date == latest.c.effective_date))
+        .order_by(ExchangeRate.currency)
+    ).all()
+    rates = MappingProxyType({**DEFAULT_RATES, **{row.currency: row.rate for row in rows}, 'IDR': 1.0})
+
+    # A rate counts as modified when it took effect or, if later, when it was entered
+    changes = [max(datetime.combine(row.effective_date, datetime.min.time()), row.created_at or datetime.min)
+               for row in rows]
+    fingerprint = ','.join(f'{row.currency}={row.rate!r}@{row.effective_date}' for row in rows)
+    return rates, (max(changes) if changes else None, fingerprint)
+
+def current_rates():
+    """Cached read-only {currency: IDR per unit} of the rates in effect today"""
+    global _rates, _stamp, _loaded_at
+
+    ttl = app.config.get('EXCHANGE_RATE_CACHE_TTL', DEFAULT_RATE_CACHE_TTL)
+    rates = _rates
+    if rates is not None and time.monotonic() - _loaded_at < ttl:
+        return rates
+
+    with _lock:
+        if _rates is None or time.monotonic() - _loaded_at >= ttl:
+            _rates, _stamp = _load_rates()
+            _loaded_at = time.monotonic()
+        return _rates
+
+def rates_stamp():
+    """(last modified, fingerprint) of the cached rates in effect today"""
+    current_rates()
+    return _stamp
+
+def get_rate(currency):
+    """IDR per unit of `currency` today; KeyError for a currency with no rate"""
+    return current_rates()[currency]
+
+def rate_on(currency, day):
+    """IDR per unit of `currency` on a past or future day (not cached)"""
+    if currency == 'IDR':
+        return 1.0
+    rate = db.session.execute(
+        db.select(ExchangeRate.rate)
+        .where(ExchangeRate.currency == currency, ExchangeRate.effective_date <= day)
+        .order_by(ExchangeRate.effective_date.desc())
+        .limit(1)
+    ).scalar()
+    return rate if rate is not None else DEFAULT_RATES[currency]
+
+def invalidate_rates():
+    """Drop the cached rates; call after committing a rate change"""
+    global _rates, _version
+    with _lock:
+        _version += 1
+        _rates = None
+
+def rates_version():
+    """Counter bumped on every invalidation in this process"""
+    return _version
+
+def rates_changed():
+    """After committing rate changes: reload the rates, re-derive stored USD prices, drop cached pages"""
+    from product_import import sync_usd_prices
+    from page_cache import bump_catalog_version
+    invalidate_rates()
+    if sync_usd_prices():
+        db.session.commit()
+    bump_catalog_version()
+
+def set_rate(currency, rate, effective_date=None, source='manual'):
+    """Store a rate (IDR per unit) from effective_date on; commit, then call rates_changed()"""
+    currency = (currency or '').strip().upper()
+    if len(currency) != 3 or not currency.isalpha() or currency == 'IDR':
+        raise ValueError(f'invalid currency {currency!r}')
+    try:
+        rate = float(rate)
+    except (TypeError, ValueError):
+        raise ValueError(f'rate for {currency} must be a number, got {rate!r}')
+    if not math.isfinite(rate) or rate <= 0:
+        raise ValueError(f'rate for {currency} must be more than zero')
+
+    effective_date = effective_date or date.today()
+    entry = db.session.get(ExchangeRate, (currency, effective_date))
+    if entry is None:
+        entry = ExchangeRate(currency=currency, effective_date=effective_date)
+        db.session.add(entry)
+    entry.rate = rate
+    entry.source = source[:100]
+    entry.created_at = datetime.utcnow()
+    return entry
+
+def rate_history(limit=50):
+    """The most recently effective rates, newest first"""
+    return (ExchangeRate.query
+            .order_by(ExchangeRate.effective_date.desc(), ExchangeRate.currency)
+            .limit(limit).all())
+
+def parse_feed(data):
+    """[(currency, IDR per unit, effective date)] from a JSON feed document.
+
+    The document has the shape most rate APIs use:
+    {"base": "USD", "date": "2025-01-31", "rates": {"IDR": 16250, "EUR": 0.96}},
+    meaning one unit of base buys that much of each currency. Any base
+    works as long as the feed also quotes IDR (or the base is IDR).
+    """
+    document = json.loads(data)
+    base = str(document.get('base', 'IDR')).upper()
+    quotes = {str(code).upper(): float(value) for code, value in (document.get('rates') or {}).items()}
+    effective_date = date.fromisoformat(document['date']) if document.get('date') else date.today()
+
+    if base == 'IDR':
+        idr_per_base = 1.0
+    elif quotes.get('IDR'):
+        idr_per_base = quotes['IDR']
+    else:
+        raise ValueError(f'feed with base {base} does not quote IDR')
+
+    rates = [] if base == 'IDR' else [(base, idr_per_base, effective_date)]
+    for code, value in quotes.items():
+        if code in ('IDR', base):
+            continue
+        if value <= 0:
+            raise ValueError(f'feed rate for {code} must be more than zero')
+        rates.append((code, idr_per_base / value, effective_date))
+    return rates
+
+def parse_csv(data):
+    """[(currency, IDR per unit, effective date)] from CSV with currency,rate[,date] columns"""
+    rates = []
+    for row in csv.DictReader(io.StringIO(data)):
+        row = {(key or '').strip().lower(): (value or '').strip() for key, value in row.items()}
+        if not row.get('currency'):
+            continue
+        effective_date = date.fromisoformat(row['date']) if row.get('date') else date.today()
+        rates.append((row['currency'], row.get('rate'), effective_date))
+    return rates
+
+def read_source(source):
+    """Rates from a JSON feed or CSV file, given as a path or an http(s)/file URL"""
+    if source.startswith(('http://', 'https://', 'file://')):
+        with urlopen(source, timeout=FEED_TIMEOUT) as response:
+            data = response.read().decode('utf-8-sig')
+    else:
+        with open(source, encoding='utf-8-sig') as handle:
+            data = handle.read()
+    if os.path.splitext(source.split('?', 1)[0])[1].lower() == '.csv':
+        return parse_csv(data)
+    return parse_feed(data)
+
+def update_rates(source, label=None):
+    """Store every rate from a source; commit, then call rates_changed()"""
+    return [set_rate(currency, rate, effective_date, source=label or source)
+            for currency, rate, effective_date in read_source(source)]
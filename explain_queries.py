@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Query plan report for the storefront and admin pages.
+Requests each route through the test client, captures the SQL it runs and
+replays every statement through EXPLAIN QUERY PLAN (SQLite) or EXPLAIN
+(PostgreSQL), flagging full table scans. Runs against the configured
+database; only GET requests are issued.
+
+Usage: python explain_queries.py [--all]   (--all prints every plan line)
+"""
+
+import sys
+from sqlalchemy import event
+from app import create_app, db
+from models import Admin, Product, Order
+
+app = create_app()
+
+captured = []
+
+def capture_statement(conn, cursor, statement, parameters, context, executemany):
+    if not executemany and statement.lstrip().upper().startswith('SELECT'):
+        captured.append((statement, parameters))
+
+def routes():
+    product = Product.query.first()
+    order = Order.query.first()
+    public = ['/', '/products', '/products?category=1', '/products?search=leaf']
+    if product:
+        public.append(f'/product/{product.id}')
+    admin = ['/admin/dashboard', '/admin/products', '/admin/products?search=leaf',
+             '/admin/categories', '/admin/orders', '/admin/orders?status=pending',
+             '/admin/shipping', '/admin/shipping?status=in_transit&type=international']
+    if order:
+        admin.append(f'/admin/orders/{order.id}')
+    return public, admin
+
+def explain(conn, statement, parameters):
+    """Plan lines for a statement and whether any of them is a full scan"""
+    if conn.dialect.name == 'sqlite':
+        rows = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+        lines = [row[-1] for row in rows]
+        full_scans = [line for line in lines
+                      if line.startswith('SCAN ') and ' USING ' not in line and 'VIRTUAL TABLE' not in line]
+    else:
+        rows = conn.exec_driver_sql(f'EXPLAIN {statement}', parameters).fetchall()
+        lines = [row[0] for row in rows]
+        full_scans = [line for line in lines if 'Seq Scan' in line]
+    return lines, full_scans
+
+def main():
+    show_all = '--all' in sys.argv
+    client = app.test_client()
+
+    with app.app_context():
+        public, admin_routes = routes()
+        admin_user = Admin.query.first()
+        engine = db.engine
+
+    # Requests run outside the app context above so each gets its own session
+    event.listen(engine, 'before_cursor_execute', capture_statement)
+    plans = []
+    for url in public + admin_routes:
+        with client.session_transaction() as sess:
+            sess.clear()
+            if url.startswith('/admin/') and admin_user:
+                sess['_user_id'] = str(admin_user.id)
+                sess['_fresh'] = True
+            sess['cart'] = {'0': 1}  # keep the page cache out of the way
+        captured.clear()
+        client.get(url)
+        plans.append((url, list(captured)))
+    event.remove(engine, 'before_cursor_execute', capture_statement)
+
+    with app.app_context():
+        total_scans = 0
+        with db.engine.connect() as conn:
+            for url, statements in plans:
+                print(f"\n{url}  ({len(statements)} statements)")
+                for statement, parameters in statements:
+                    lines, full_scans = explain(conn, statement, parameters)
+                    total_scans += len(full_scans)
+                    if full_scans or show_all:
+                        print(f"  {' '.join(statement.split())[:110]}")
+                        for line in (lines if show_all else full_scans):
+                            marker = '✗' if line in full_scans else ' '
+                            print(f"    {marker} {line}")
+
+    print(f"\n{total_scans} full table scan(s) found")
+
+if __name__ == '__main__':
+    main()
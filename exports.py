@@ -0,0 +1,141 @@
+import io
+import csv
+import os
+import tempfile
+from datetime import datetime, time, timedelta
+from app import app, db
+from models import Product, Order, OrderItem
+
+try:
+    import openpyxl
+except ImportError:  # XLSX export is optional; CSV always works
+    openpyxl = None
+
+# Order exports for the admin panel. One row per order item, with the order's
+# fields repeated, read with yield_per so the database hands rows over in
+# batches (a server-side cursor on PostgreSQL) and the response is written as
+# they arrive. Exporting a year of orders never holds more than one batch of
+# rows in worker memory. Columns are selected directly rather than loading
+# Order/OrderItem objects, so the session's identity map does not grow either.
+EXPORT_BATCH_SIZE = 1000
+
+# CSV is flushed to the client in chunks of roughly this many characters
+CSV_CHUNK_SIZE = 64 * 1024
+
+EXPORT_COLUMNS = [
+    ('Order Number', Order.order_number),
+    ('Order Date', Order.created_at),
+    ('Status', Order.status),
+    ('Customer', Order.customer_name),
+    ('Email', Order.customer_email),
+    ('Phone', Order.customer_phone),
+    ('Company', Order.customer_company),
+    ('Country', Order.customer_country),
+    ('Shipping Address', Order.shipping_address),
+    ('Currency', Order.currency),
+    ('Order Total', Order.total_amount),
+    ('International', Order.is_international),
+    ('Shipping Service', Order.shipping_service),
+    ('Tracking Number', Order.tracking_number),
+    ('Shipping Status', Order.shipping_status),
+    ('Shipping Date', Order.shipping_date),
+    ('Product ID', OrderItem.product_id),
+    ('Product', Product.name_en),
+    ('Unit', Product.unit),
+    ('Quantity', OrderItem.quantity),
+    ('Unit Price', OrderItem.unit_price),
+    ('Item Total', OrderItem.total_price),
+]
+
+def order_export_statement(statuses=(), shipping_status='all', shipping_type='all', start=None, end=None):
+    """SELECT of order items joined to their order and product, oldest order first.
+
+    The filters match the admin order and shipping lists: `statuses` is a
+    list of order statuses (empty for all), `shipping_status` and
+    `shipping_type` ('domestic' / 'international') are as on the shipping
+    page, and `start`/`end` are inclusive order dates.
+    """
+    statement = (
+        db.select(*[column for _, column in EXPORT_COLUMNS])
+        .select_from(Order)
+        .outerjoin(OrderItem, OrderItem.order_id == Order.id)
+        .outerjoin(Product, Product.id == OrderItem.product_id)
+        .order_by(Order.created_at, Order.id, OrderItem.id)
+    )
+    if statuses:
+        statement = statement.where(Order.status.in_(statuses))
+    if shipping_status != 'all':
+        statement = statement.where(Order.shipping_status == shipping_status)
+    if shipping_type == 'domestic':
+        statement = statement.where(Order.is_international.is_(False))
+    elif shipping_type == 'international':
+        statement = statement.where(Order.is_international.is_(True))
+    if start:
+        statement = statement.where(Order.created_at >= datetime.combine(start, time.min))
+    if end:
+        statement = statement.where(Order.created_at < datetime.combine(end + timedelta(days=1), time.min))
+    return statement
+
+def export_rows(statement):
+    """Rows of the statement, fetched EXPORT_BATCH_SIZE at a time"""
+    batch_size = app.config.get('EXPORT_BATCH_SIZE', EXPORT_BATCH_SIZE)
+    result = db.session.execute(statement.execution_options(yield_per=batch_size))
+    try:
+        yield from result
+    finally:
+        result.close()
+
+def _cell_value(value):
+    if isinstance(value, str) and value[:1] in ('=', '+', '-', '@'):
+        # Customer-entered text must not be evaluated as a spreadsheet formula
+        return "'" + value
+    return value
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, bool):
+        return 'yes' if value else 'no'
+    return _cell_value(value)
+
+def csv_stream(rows):
+    """Yield CSV text in chunks: a BOM (so Excel reads UTF-8), the header, then the rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    writer.writerow([title for title, _ in EXPORT_COLUMNS])
+    for row in rows:
+        writer.writerow([_csv_value(value) for value in row])
+        if buffer.tell() >= CSV_CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def xlsx_available():
+    return openpyxl is not None
+
+def xlsx_stream(rows, chunk_size=CSV_CHUNK_SIZE):
+    """Yield an XLSX workbook of the rows in chunks.
+
+    The workbook is written in openpyxl's write-only mode, which spools rows
+    to disk, then read back from a temporary file; the spreadsheet is never
+    held in memory whole.
+    """
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet('Orders')
+    sheet.append([title for title, _ in EXPORT_COLUMNS])
+    for row in rows:
+        sheet.append([_cell_value(value) for value in row])
+
+    handle, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(handle)
+    try:
+        workbook.save(path)
+        with open(path, 'rb') as spreadsheet:
+            while chunk := spreadsheet.read(chunk_size):
+                yield chunk
+    finally:
+        os.remove(path)
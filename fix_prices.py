@@ -1,38 +1,33 @@
-
+from datetime import datetime
 from app import app, db
 from models import Product
+from exchange_rates import get_rate
+from product_import import sync_usd_prices
+
+# Prices above this in IDR were probably stored as USD * rate twice
+SUSPICIOUS_PRICE_IDR = 10000000
 
 def fix_product_prices():
     """Fix existing product prices that might have been incorrectly stored"""
     with app.app_context():
-        products = Product.query.all()
-        
-        for product in products:
-            print(f"Checking product: {product.name_en}")
-            print(f"  Current price_idr: {product.price_idr}")
-            print(f"  Current price_usd: {product.price_usd}")
-            
-            # If price_idr seems too high (more than 10 million), it might be wrongly calculated
-            if product.price_idr and product.price_idr > 10000000:
-                print(f"  ⚠ Suspicious high price detected for {product.name_en}")
-                
-                # Check if price_usd looks more reasonable
-                if product.price_usd and product.price_usd < 1000:
-                    # Use USD price and convert to IDR
-                    correct_price_idr = float(product.price_usd) * 15300
-                    print(f"  → Correcting price_idr from {product.price_idr} to {correct_price_idr}")
-                    product.price_idr = correct_price_idr
-                else:
-                    # Ask for manual correction
-                    print(f"  → Please manually check and correct the price for {product.name_en}")
-            
-            # Ensure price_usd is correctly calculated from price_idr
-            if product.price_idr:
-                correct_price_usd = float(product.price_idr) / 15300
-                if abs(float(product.price_usd or 0) - correct_price_usd) > 0.01:
-                    print(f"  → Correcting price_usd from {product.price_usd} to {correct_price_usd}")
-                    product.price_usd = correct_price_usd
-        
+        suspicious = Product.price_idr > SUSPICIOUS_PRICE_IDR
+
+        # Recover price_idr from a plausible USD price in one UPDATE
+        corrected = db.session.execute(
+            db.update(Product)
+            .where(suspicious, Product.price_usd < 1000)
+            .values(price_idr=Product.price_usd * get_rate('USD'), updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        print(f"✓ Corrected price_idr from price_usd on {corrected} products")
+
+        for product_id, name in db.session.execute(
+                db.select(Product.id, Product.name_en).where(suspicious)):
+            print(f"  ⚠ Please manually check and correct the price for {name} (id {product_id})")
+
+        # Ensure price_usd is correctly calculated from price_idr
+        print(f"✓ Recalculated price_usd on {sync_usd_prices()} products")
+
         db.session.commit()
         print("✅ Price correction completed!")
 
@@ -0,0 +1,95 @@
+import hashlib
+from datetime import timezone
+from functools import wraps
+from flask import request, session, g, make_response
+from sqlalchemy import func, true
+from app import app, db
+from models import Product, Category, CompanySettings
+from page_cache import is_cacheable_request, cached_validators
+from preferences import get_preferences
+from exchange_rates import rates_stamp
+
+# Conditional GET for the public catalog. The validators come from one
+# aggregate query over the rows a page shows, so a matching If-None-Match or
+# If-Modified-Since is answered with a 304 before the view or template runs.
+# Pages in the page cache carry the validators computed when they were
+# rendered, so the query only runs on a page-cache miss.
+
+def catalog_stamp(category_id=None, product_id=None):
+    """(last modified, fingerprint) for the products, categories and settings a page shows.
+
+    With `product_id` the products are scoped to that product's category
+    (the product plus its related products); with `category_id` to that
+    category. Row counts are part of the fingerprint so deletions count too.
+    """
+    product_filter = true()
+    if product_id is not None:
+        product_filter = Product.category_id == (
+            db.select(Product.category_id).where(Product.id == product_id).scalar_subquery())
+    elif category_id:
+        product_filter = Product.category_id == category_id
+
+    row = db.session.execute(db.select(
+        db.select(func.max(Product.updated_at)).where(product_filter).scalar_subquery(),
+        db.select(func.count(Product.id)).where(product_filter).scalar_subquery(),
+        db.select(func.max(Category.updated_at)).scalar_subquery(),
+        db.select(func.count(Category.id)).scalar_subquery(),
+        db.select(func.max(CompanySettings.updated_at)).scalar_subquery(),
+    )).one()
+
+    timestamps = [value for value in (row[0], row[2], row[4]) if value is not None]
+    last_modified = None
+    if timestamps:
+        last_modified = max(timestamps).replace(microsecond=0, tzinfo=timezone.utc)
+    return last_modified, '|'.join(str(value) for value in row)
+
+def _not_modified(etag, last_modified):
+    # If-None-Match takes precedence over If-Modified-Since (RFC 9110)
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since and last_modified:
+        return last_modified <= request.if_modified_since
+    return False
+
+def conditional_page(view):
+    """Answer ETag / Last-Modified revalidation for a public catalog page"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not is_cacheable_request():
+            return view(*args, **kwargs)
+
+        validators = cached_validators()
+        if validators is None:
+            lang, currency = get_preferences()
+            last_modified, fingerprint = catalog_stamp(category_id=request.args.get('category'),
+                                                       product_id=kwargs.get('product_id'))
+            # Converted prices change with the rates, not with any catalog row
+            rates_modified, rates_fingerprint = rates_stamp()
+            if rates_modified:
+                rates_modified = rates_modified.replace(microsecond=0, tzinfo=timezone.utc)
+                last_modified = max(last_modified, rates_modified) if last_modified else rates_modified
+            etag = hashlib.sha1(f'{fingerprint}|{rates_fingerprint}|{lang}|{currency}|{request.full_path}'
+                                .encode()).hexdigest()
+            validators = g.page_validators = (etag, last_modified)
+        etag, last_modified = validators
+
+        if _not_modified(etag, last_modified):
+            response = app.response_class(status=304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+        response.set_etag(etag)
+        if last_modified:
+            response.last_modified = last_modified
+        # The page depends only on what preferences.vary_on_preferences lists
+        # in Vary, so shared caches may keep it unless this request changed
+        # the session; everyone revalidates with the validators above.
+        if session.modified:
+            response.cache_control.private = True
+        else:
+            response.cache_control.public = True
+        response.cache_control.no_cache = True
+        return response
+    return wrapper
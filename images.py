@@ -0,0 +1,413 @@
+import hashlib
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from flask import url_for
+from app import app, db
+from media_storage import storage
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Without Pillow uploads are stored as they are, without variants
+    Image = None
+
+# Uploaded images. With Pillow installed each upload is first re-encoded
+# upright and without its EXIF/metadata, then stored under a hash of the
+# result, so a stored file always hashes to its name and the same picture
+# uploaded again reuses it instead of adding a copy. A small worker pool
+# then, off the request thread, writes resized variants for the product
+# grids and galleries, each in the original's format and as WebP. Templates
+# only point srcset at the variants once the last of them exists; until
+# then (or without Pillow) they show the original.
+#
+# Uploads are read in chunks into a temporary file, hashed as they are
+# written and moved into the media store (media_storage), so a large image
+# never sits in worker memory whole. The type comes from the file's first
+# bytes, not its name. MAX_IMAGE_UPLOAD_SIZE bounds each file; Flask's
+# MAX_CONTENT_LENGTH bounds the request.
+#
+# Replaced and deleted images are not removed inline, since several records
+# may share one file. collect_garbage() instead lists the store, keeps every
+# object referenced by a product image, the logo or the gallery (with its
+# variants) and deletes the rest in batches, sparing objects younger than
+# MEDIA_GC_GRACE_SECONDS (uploads whose record is not committed yet; an
+# upload reusing a stored file touches it and its variants) and the bundled
+# DEFAULT_GALLERY_FILES. Admin changes that drop a reference
+# schedule a run on the worker pool; `flask gc-media` runs one directly.
+UPLOAD_CHUNK_SIZE = 64 * 1024
+DEFAULT_MAX_IMAGE_UPLOAD_SIZE = 10 * 1024 * 1024
+
+# Leading bytes of each accepted format (WebP: "RIFF", 4 size bytes, "WEBP")
+SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+)
+
+# Variant name and width in pixels; smaller images are not enlarged
+VARIANTS = (('thumb', 320), ('card', 640), ('full', 1280))
+
+HASH_LENGTH = 20
+
+# Hero images shipped in static/uploads, shown by the nature_life and theme2
+# themes until a gallery is uploaded (main.js reads them from the
+# default-gallery-images meta tag)
+DEFAULT_GALLERY_FILES = (
+    '75a6fa78bd5a43d8a44e6b89aa9df62e_Cara-Packing-Daun-Pisang.jpg',
+    '174d8d4619da42ca91e895cff22ef0a2_Cara-Packing-Daun-Pisang.jpg',
+    '7b32c3f6c9814457b8895b3ca5224276_Cara-Packing-Daun-Pisang.jpg',
+    '8cb860c8ae5a472fafa627c098f03a4e_Cara-Packing-Daun-Pisang.jpg',
+    'f9d1c55013b5436c8c0e5481328fcee1_Cara-Packing-Daun-Pisang.jpg',
+)
+DEFAULT_IMAGE_WORKERS = 2
+
+# How long an image found without variants is not looked up again (every
+# lookup is a filesystem stat, or a HEAD request on S3)
+DEFAULT_VARIANT_RECHECK_SECONDS = 60
+
+DEFAULT_GC_GRACE_SECONDS = 6 * 3600
+GC_BATCH_SIZE = 500
+
+# Format of the non-WebP variants per original extension
+VARIANT_EXTENSIONS = {'jpg': 'jpg', 'png': 'png', 'gif': 'png', 'webp': 'webp'}
+PIL_FORMATS = {'jpg': 'JPEG', 'png': 'PNG', 'webp': 'WEBP'}
+SAVE_OPTIONS = {
+    'jpg': {'quality': 85, 'optimize': True, 'progressive': True},
+    'png': {'optimize': True},
+    'webp': {'quality': 80, 'method': 4},
+}
+ORIGINAL_SAVE_OPTIONS = {'jpg': {'quality': 92}, 'webp': {'quality': 90}}
+
+_HASHED_NAME = re.compile(rf'^([0-9a-f]{{{HASH_LENGTH}}})\.(jpg|png|gif|webp)$')
+
+ImageVariants = namedtuple('ImageVariants', 'srcset webp_srcset')
+
+log = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_executor = None
+_gc_pending = False
+_ready = set()
+_missing = {}
+
+class UploadRejected(ValueError):
+    """An upload that is not an accepted image or is too large"""
+
+def sniff_image_type(head):
+    """Extension for the image format the leading bytes belong to, or None"""
+    for signature, extension in SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+def _variant_name(digest, name, extension):
+    return f'{digest}-{name}.{extension}'
+
+def _last_variant_name(digest):
+    return _variant_name(digest, VARIANTS[-1][0], 'webp')
+
+def _variant_names(digest, extension):
+    """Names of every variant of the upload digest.extension"""
+    names = []
+    for name, _ in VARIANTS:
+        names.append(_variant_name(digest, name, VARIANT_EXTENSIONS[extension]))
+        names.append(_variant_name(digest, name, 'webp'))
+    return names
+
+def _file_digest(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(UPLOAD_CHUNK_SIZE), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+def _strip_metadata(path, extension):
+    """Re-encode an image file in place, upright and without metadata; False when kept as is"""
+    if Image is None or extension not in PIL_FORMATS:
+        return False
+    try:
+        with Image.open(path) as source:
+            if getattr(source, 'is_animated', False):
+                return False  # re-encoding would keep only the first frame
+            image = ImageOps.exif_transpose(source)
+            image.load()
+    except (OSError, ValueError, Image.DecompressionBombError) as error:
+        raise UploadRejected(f'the image could not be read ({error})') from error
+
+    if extension == 'jpg' and image.mode not in ('RGB', 'L', 'CMYK'):
+        image = image.convert('RGB')
+    # Saving without exif/info drops camera, GPS and editor metadata
+    with open(path, 'wb') as handle:
+        image.save(handle, PIL_FORMATS[extension],
+                   **{**SAVE_OPTIONS[extension], **ORIGINAL_SAVE_OPTIONS.get(extension, {})})
+    return True
+
+def _content_name(path, extension, digest=None):
+    """Strip the metadata of the image at `path` and return its content-hash name.
+
+    `digest` is the hash of the file as it stands, when already known.
+    """
+    if _strip_metadata(path, extension) or digest is None:
+        digest = _file_digest(path)
+    return f'{digest[:HASH_LENGTH]}.{extension}'
+
+def _hashed_name(url):
+    """(digest, extension) of a content-hashed upload URL, or None"""
+    match = _HASHED_NAME.match(storage().name_for(url) or '')
+    return match.groups() if match else None
+
+def pillow_available():
+    return Image is not None
+
+def _pool():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=app.config.get('IMAGE_WORKERS', DEFAULT_IMAGE_WORKERS),
+                thread_name_prefix='images')
+        return _executor
+
+def save_upload(file):
+    """Store an uploaded image under its content hash and return its URL.
+
+    Metadata is stripped before hashing, an identical image already stored
+    is reused and variants are generated in the background. Returns None when no file was chosen; raises
+    UploadRejected for anything but a JPEG, PNG, GIF or WebP image within
+    MAX_IMAGE_UPLOAD_SIZE.
+    """
+    if not file or not file.filename:
+        return None
+
+    store = storage()
+    limit = app.config.get('MAX_IMAGE_UPLOAD_SIZE', DEFAULT_MAX_IMAGE_UPLOAD_SIZE)
+    sha = hashlib.sha256()
+    size = 0
+    extension = None
+    partial = store.temporary_file()
+    try:
+        with partial:
+            for chunk in iter(lambda: file.stream.read(UPLOAD_CHUNK_SIZE), b''):
+                if extension is None:
+                    extension = sniff_image_type(chunk)
+                    if extension is None:
+                        raise UploadRejected(f'{file.filename} is not a JPEG, PNG, GIF or WebP image')
+                size += len(chunk)
+                if size > limit:
+                    raise UploadRejected(f'{file.filename} is larger than {limit // (1024 * 1024)} MB')
+                sha.update(chunk)
+                partial.write(chunk)
+        if extension is None:
+            raise UploadRejected(f'{file.filename} is empty')
+
+        try:
+            filename = _content_name(partial.name, extension, sha.hexdigest())
+        except UploadRejected as error:
+            raise UploadRejected(f'{file.filename}: {error}') from None
+        variants_stored = _store_upload(filename, partial.name)
+    finally:
+        if os.path.exists(partial.name):
+            os.remove(partial.name)
+
+    if not variants_stored:
+        submit_variants(filename, force=True)
+    return store.url(filename)
+
+def _store_upload(filename, path):
+    """Move the file at `path` into the store as `filename` unless an identical one is there.
+
+    A stored copy may have been unreferenced for longer than the GC grace
+    period, so it and its variants get a fresh modified time: the new
+    record referring to them may not be committed before the next
+    collect_garbage(). Returns whether every variant is stored.
+    """
+    store = storage()
+    if not store.touch(filename):
+        store.put(filename, path)
+        return False
+    digest, extension = filename.rsplit('.', 1)
+    touched = [store.touch(name) for name in _variant_names(digest, extension)]
+    if all(touched):
+        return True
+    _ready.discard(digest)
+    return False
+
+def submit_variants(filename, force=False):
+    """Queue variant generation for a stored upload; no-op without Pillow or, unless `force`, when done"""
+    digest, extension = filename.rsplit('.', 1)
+    if Image is None or not force and storage().exists(_last_variant_name(digest)):
+        return None
+    return _pool().submit(_generate_variants, digest, extension)
+
+def _save(image, name, extension, **options):
+    store = storage()
+    partial = store.temporary_file()
+    try:
+        with partial:
+            image.save(partial, PIL_FORMATS[extension], **{**SAVE_OPTIONS[extension], **options})
+        store.put(name, partial.name)
+    finally:
+        if os.path.exists(partial.name):
+            os.remove(partial.name)
+
+def _generate_variants(digest, extension):
+    filename = f'{digest}.{extension}'
+    try:
+        with storage().local_copy(filename) as path, Image.open(path) as source:
+            if getattr(source, 'is_animated', False):
+                return  # resizing would keep only the first frame
+            image = ImageOps.exif_transpose(source)
+            image.load()
+
+        # The stored original stays as it is: its bytes are what its name hashes
+        variant_extension = VARIANT_EXTENSIONS[extension]
+        if variant_extension == 'jpg' and image.mode != 'RGB':
+            image = image.convert('RGB')
+        elif image.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+            image = image.convert('RGBA')
+
+        for name, width in VARIANTS:
+            variant = image
+            if image.width > width:
+                variant = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+            _save(variant, _variant_name(digest, name, variant_extension), variant_extension)
+            if variant_extension != 'webp':
+                _save(variant, _variant_name(digest, name, 'webp'), 'webp')
+        _ready.add(digest)
+        _missing.pop(digest, None)
+    except Exception:
+        log.exception('Could not generate image variants for %s', filename)
+
+def wait_for_variants(futures):
+    for future in futures:
+        if future is not None:
+            future.result()
+
+def image_variants(url):
+    """srcset strings for an upload's variants, or None until they exist"""
+    hashed = _hashed_name(url)
+    if hashed is None:
+        return None
+    digest, extension = hashed
+    store = storage()
+    if digest not in _ready:
+        checked_at = _missing.get(digest)
+        recheck = app.config.get('IMAGE_VARIANT_RECHECK_SECONDS', DEFAULT_VARIANT_RECHECK_SECONDS)
+        if checked_at is not None and time.monotonic() - checked_at < recheck:
+            return None
+        if not store.exists(_last_variant_name(digest)):
+            _missing[digest] = time.monotonic()
+            return None
+        _ready.add(digest)
+        _missing.pop(digest, None)
+
+    variant_extension = VARIANT_EXTENSIONS[extension]
+    return ImageVariants(
+        ', '.join(f'{store.url(_variant_name(digest, name, variant_extension))} {width}w' for name, width in VARIANTS),
+        ', '.join(f'{store.url(_variant_name(digest, name, "webp"))} {width}w' for name, width in VARIANTS),
+    )
+
+def is_hashed_upload(url):
+    return _hashed_name(url) is not None
+
+def adopt_upload(url):
+    """Content-hashed URL for an upload stored under its old per-upload name"""
+    store = storage()
+    name = store.name_for(url)
+    if not name or _HASHED_NAME.match(name) or not store.exists(name):
+        return url, None
+
+    # Work on a copy: stripping rewrites the file and the old name stays until GC
+    partial = store.temporary_file()
+    try:
+        with partial, store.local_copy(name) as path, open(path, 'rb') as source:
+            extension = sniff_image_type(source.read(16))
+            source.seek(0)
+            shutil.copyfileobj(source, partial)
+        if extension is None:
+            return url, None
+        try:
+            filename = _content_name(partial.name, extension)
+        except UploadRejected:
+            log.warning('Could not read %s; left under its old name', name)
+            return url, None
+        _store_upload(filename, partial.name)
+    finally:
+        if os.path.exists(partial.name):
+            os.remove(partial.name)
+    return store.url(filename), filename
+
+def default_gallery_images():
+    """URLs of the bundled hero images"""
+    return [url_for('static', filename=f'uploads/{name}') for name in DEFAULT_GALLERY_FILES]
+
+def referenced_names():
+    """Names of every stored object a product, the logo, the gallery or the default gallery uses, variants included"""
+    from models import Product, CompanySettings
+    store = storage()
+    urls = set(db.session.execute(db.select(Product.image_url).distinct()).scalars())
+    for logo_url, gallery_images in db.session.execute(
+            db.select(CompanySettings.logo_url, CompanySettings.gallery_images)):
+        urls.add(logo_url)
+        urls.update(url.strip() for url in (gallery_images or '').split(','))
+
+    names = set(DEFAULT_GALLERY_FILES)
+    for url in urls:
+        name = store.name_for(url)
+        if not name:
+            continue
+        names.add(name)
+        match = _HASHED_NAME.match(name)
+        if match:
+            names.update(_variant_names(*match.groups()))
+    return names
+
+def collect_garbage(batch_size=GC_BATCH_SIZE):
+    """Delete stored objects nothing refers to, in batches; returns how many"""
+    store = storage()
+    referenced = referenced_names()
+    cutoff = time.time() - app.config.get('MEDIA_GC_GRACE_SECONDS', DEFAULT_GC_GRACE_SECONDS)
+
+    deleted = 0
+    batch = []
+    for name, modified in store.list():
+        if name in referenced or modified > cutoff:
+            continue
+        batch.append(name)
+        if len(batch) >= batch_size:
+            store.delete(batch)
+            deleted += len(batch)
+            batch = []
+    if batch:
+        store.delete(batch)
+        deleted += len(batch)
+    if deleted:
+        log.info('Media garbage collection deleted %d objects', deleted)
+    return deleted
+
+def _collect_in_background():
+    global _gc_pending
+    with _lock:
+        _gc_pending = False
+    with app.app_context():
+        try:
+            collect_garbage()
+        except Exception:
+            log.exception('Media garbage collection failed')
+
+def schedule_gc():
+    """Run collect_garbage() on the worker pool soon; call after committing a dropped image reference"""
+    global _gc_pending
+    with _lock:
+        if _gc_pending:
+            return
+        _gc_pending = True
+    _pool().submit(_collect_in_background)
@@ -9,6 +9,8 @@ import sys
 from app import app, db
 from models import Category, Product, CompanySettings, Admin
 from werkzeug.security import generate_password_hash
+from search_index import ensure_search_index, rebuild_search_index
+from dashboard_stats import reconcile
 
 def init_database():
     """Initialize the database with sample data"""
@@ -227,6 +229,15 @@ def create_sample_products():
     db.session.commit()
     print(f"✓ Sample products created ({created_count} new products)")
 
+    if not ensure_search_index():
+        rebuild_search_index()
+        db.session.commit()
+    print("✓ Product search index rebuilt")
+
+    reconcile()
+    db.session.commit()
+    print("✓ Dashboard statistics reconciled")
+
 def reset_database():
     """Reset the entire database (WARNING: This will delete all data!)"""
     
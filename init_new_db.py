@@ -2,6 +2,8 @@ from app import app, db
 from models import Admin, Category, Product, CompanySettings
 from werkzeug.security import generate_password_hash
 from datetime import datetime
+from search_index import ensure_search_index, rebuild_search_index
+from dashboard_stats import reconcile
 
 def init_database():
     """Initialize SQLite database with sample data"""
@@ -93,6 +95,15 @@ def init_database():
             db.session.commit()
             print("✓ Sample products created")
 
+        if not ensure_search_index():
+            rebuild_search_index()
+            db.session.commit()
+        print("✓ Product search index rebuilt")
+
+        reconcile()
+        db.session.commit()
+        print("✓ Dashboard statistics reconciled")
+
         print("✓ SQLite database initialization completed successfully!")
 
 if __name__ == '__main__':
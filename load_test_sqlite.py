@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+SQLite concurrency load test for the catalog and order placement.
+For each SQLite profile, seeds a throwaway database and runs reader processes
+(GET /products) alongside writer processes (POST /place_order) for a fixed
+time, like gunicorn workers sharing one database file. Reports reads and
+orders per second, the 95th percentile read latency, and how many requests
+failed because the database was locked.
+
+Usage: python load_test_sqlite.py [seconds] [readers] [writers]
+"""
+
+import os
+import sys
+import time
+import tempfile
+import multiprocessing
+
+PROFILES = ('default', 'production')
+
+def load_app(database_url, profile):
+    os.environ['DATABASE_URL'] = database_url
+    os.environ['SQLITE_PROFILE'] = profile
+    import logging
+    logging.disable(logging.CRITICAL)
+    from app import create_app
+    app = create_app()
+    app.config['PAGE_CACHE_ENABLED'] = False  # every read goes to the database
+    return app
+
+def seed(database_url, profile):
+    app = load_app(database_url, profile)
+    from app import db, init_database
+    from models import Category, Product
+    init_database()
+    with app.app_context():
+        category = Category(name_en='Fresh Banana Leaves', name_id='Daun Pisang Segar')
+        db.session.add(category)
+        db.session.flush()
+        db.session.add_all([
+            Product(
+                name_en=f'Banana Leaf {i}',
+                name_id=f'Daun Pisang {i}',
+                description_en='Fresh leaves',
+                description_id='Daun segar',
+                price_idr=35000,
+                price_usd=35000 / 15300,
+                category_id=category.id,
+                is_available=True
+            )
+            for i in range(40)
+        ])
+        db.session.commit()
+
+def worker(role, database_url, profile, seconds, results):
+    app = load_app(database_url, profile)
+    client = app.test_client()
+    done = locked = 0
+    latencies = []
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            if role == 'read':
+                response = client.get('/products')
+                latencies.append(time.perf_counter() - started)
+            else:
+                with client.session_transaction() as sess:
+                    sess['cart'] = {'1': 2, '2': 1}
+                response = client.post('/place_order', data={
+                    'customer_name': 'Load Test',
+                    'customer_email': 'load@example.com',
+                    'customer_country': 'Indonesia',
+                    'shipping_address': 'Jakarta'
+                })
+            if response.status_code >= 500:
+                locked += 1
+            else:
+                done += 1
+        except Exception as e:
+            if 'locked' not in str(e):
+                raise
+            locked += 1
+    results.put((role, done, locked, latencies))
+
+def run_profile(profile, seconds, readers, writers):
+    db_dir = tempfile.mkdtemp()
+    database_url = f"sqlite:///{os.path.join(db_dir, f'load_{profile}.db')}"
+
+    ctx = multiprocessing.get_context('spawn')
+    setup = ctx.Process(target=seed, args=(database_url, profile))
+    setup.start()
+    setup.join()
+
+    results = ctx.Queue()
+    processes = [ctx.Process(target=worker, args=(role, database_url, profile, seconds, results))
+                 for role in ['read'] * readers + ['write'] * writers]
+    for process in processes:
+        process.start()
+    totals = {'read': [0, 0], 'write': [0, 0]}
+    latencies = []
+    for _ in processes:
+        role, done, locked, worker_latencies = results.get()
+        totals[role][0] += done
+        totals[role][1] += locked
+        latencies.extend(worker_latencies)
+    for process in processes:
+        process.join()
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95)] if latencies else 0
+    return totals, p95
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    readers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    writers = int(sys.argv[3]) if len(sys.argv) > 3 else 2
+
+    print(f"{readers} readers, {writers} writers, {seconds:g}s per profile")
+    print(f"{'profile':12} {'reads/s':>9} {'orders/s':>9} {'read p95':>9} {'locked':>7}")
+    for profile in PROFILES:
+        totals, p95 = run_profile(profile, seconds, readers, writers)
+        reads, read_errors = totals['read']
+        orders, write_errors = totals['write']
+        print(f"{profile:12} {reads / seconds:>9.1f} {orders / seconds:>9.1f} {p95 * 1000:>7.0f}ms {read_errors + write_errors:>7}")
+
+if __name__ == '__main__':
+    main()
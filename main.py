@@ -1,4 +1,9 @@
-from app import app
+from app import create_app, init_database
+
+app = create_app()
 
 if __name__ == '__main__':
+    # The development server prepares the database itself; production
+    # workers expect `flask --app main init-db` to have run beforehand.
+    init_database()
     app.run(host='0.0.0.0', port=5000, debug=True)
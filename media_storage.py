@@ -0,0 +1,177 @@
+import mimetypes
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from app import app
+
+try:
+    import boto3
+except ImportError:  # Only needed for MEDIA_STORAGE = 's3'
+    boto3 = None
+
+# Where uploaded media lives. Both backends store flat object names (the
+# content-hash names from images.py) and know the public URL prefix, so a
+# stored URL maps back to its object for reference tracking and garbage
+# collection:
+#
+#   local  files in static/uploads, served by Flask as static
+#          files; moves into the store are atomic renames
+#   s3     objects in MEDIA_S3_BUCKET on S3 or any S3-compatible server
+#          (MinIO, ...) at MEDIA_S3_ENDPOINT, served from MEDIA_URL;
+#          needs boto3, credentials come from the usual AWS_* variables
+DEFAULT_MEDIA_ROOT = 'static/uploads'
+DEFAULT_MEDIA_URL = '/static/uploads/'
+
+# S3 DeleteObjects accepts at most this many keys per call
+S3_DELETE_BATCH = 1000
+
+# Error codes S3 and compatible servers use for a missing object
+S3_MISSING_CODES = ('404', 'NoSuchKey', 'NotFound')
+
+_lock = threading.Lock()
+_storage = None
+
+class LocalStorage:
+    """Media files in a directory below the static folder"""
+
+    def __init__(self, root, url_prefix):
+        self.root = root
+        self.url_prefix = url_prefix
+
+    def url(self, name):
+        return self.url_prefix + name
+
+    def name_for(self, url):
+        """Object name a URL points at, or None for URLs outside the store"""
+        if url and url.startswith(self.url_prefix):
+            return url[len(self.url_prefix):]
+        return None
+
+    def temporary_file(self):
+        """A new temporary file from which put() can move in without copying"""
+        os.makedirs(self.root, exist_ok=True)
+        return tempfile.NamedTemporaryFile(dir=self.root, suffix='.part', delete=False)
+
+    def exists(self, name):
+        return os.path.exists(os.path.join(self.root, name))
+
+    def touch(self, name):
+        """Set an object's modified time to now; False when there is no such object"""
+        try:
+            os.utime(os.path.join(self.root, name))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def put(self, name, source_path):
+        """Move a local file into the store under `name`, replacing any object there"""
+        os.chmod(source_path, 0o644)  # mkstemp creates files readable by the owner only
+        os.replace(source_path, os.path.join(self.root, name))
+
+    @contextmanager
+    def local_copy(self, name):
+        yield os.path.join(self.root, name)
+
+    def list(self):
+        """(name, modified timestamp) for every object, read lazily"""
+        if not os.path.isdir(self.root):
+            return
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    yield entry.name, entry.stat().st_mtime
+
+    def delete(self, names):
+        for name in names:
+            try:
+                os.remove(os.path.join(self.root, name))
+            except FileNotFoundError:
+                pass
+
+class S3Storage:
+    """Media objects in an S3 or S3-compatible bucket"""
+
+    def __init__(self, bucket, url_prefix, endpoint_url=None):
+        if boto3 is None:
+            raise RuntimeError("MEDIA_STORAGE = 's3' needs boto3 (pip install boto3)")
+        self.bucket = bucket
+        self.url_prefix = url_prefix
+        self.client = boto3.client('s3', endpoint_url=endpoint_url)
+
+    url = LocalStorage.url
+    name_for = LocalStorage.name_for
+
+    def temporary_file(self):
+        return tempfile.NamedTemporaryFile(suffix='.part', delete=False)
+
+    def exists(self, name):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=name)
+        except self.client.exceptions.ClientError as error:
+            if error.response.get('Error', {}).get('Code') in S3_MISSING_CODES:
+                return False
+            raise
+        return True
+
+    def touch(self, name):
+        # S3 has no touch: copying an object onto itself with replaced
+        # metadata gives it a new LastModified
+        content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        try:
+            self.client.copy_object(Bucket=self.bucket, Key=name, CopySource={'Bucket': self.bucket, 'Key': name},
+                                    MetadataDirective='REPLACE', ContentType=content_type)
+        except self.client.exceptions.ClientError as error:
+            if error.response.get('Error', {}).get('Code') in S3_MISSING_CODES:
+                return False
+            raise
+        return True
+
+    def put(self, name, source_path):
+        content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        try:
+            self.client.upload_file(source_path, self.bucket, name, ExtraArgs={'ContentType': content_type})
+        finally:
+            os.remove(source_path)
+
+    @contextmanager
+    def local_copy(self, name):
+        handle = self.temporary_file()
+        try:
+            with handle:
+                self.client.download_fileobj(self.bucket, name, handle)
+            yield handle.name
+        finally:
+            os.remove(handle.name)
+
+    def list(self):
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket):
+            for item in page.get('Contents', ()):
+                yield item['Key'], item['LastModified'].timestamp()
+
+    def delete(self, names):
+        names = list(names)
+        for start in range(0, len(names), S3_DELETE_BATCH):
+            self.client.delete_objects(Bucket=self.bucket, Delete={
+                'Objects': [{'Key': name} for name in names[start:start + S3_DELETE_BATCH]],
+                'Quiet': True,
+            })
+
+def _create_storage():
+    config = app.config
+    if config.get('MEDIA_STORAGE', 'local') == 's3':
+        endpoint = config.get('MEDIA_S3_ENDPOINT') or None
+        bucket = config['MEDIA_S3_BUCKET']
+        url_prefix = config.get('MEDIA_URL') or f"{(endpoint or 'https://s3.amazonaws.com').rstrip('/')}/{bucket}/"
+        return S3Storage(bucket, url_prefix, endpoint_url=endpoint)
+    return LocalStorage(DEFAULT_MEDIA_ROOT, DEFAULT_MEDIA_URL)
+
+def storage():
+    """The configured media storage, created on first use"""
+    global _storage
+    if _storage is None:
+        with _lock:
+            if _storage is None:
+                _storage = _create_storage()
+    return _storage
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Versioned schema migrations for Banana Leaf Export website.
+Brings databases created by older versions of models.py up to date. The
+applied version is recorded in the schema_version table, so a database that
+is already current costs one query; pending migrations run together in a
+single transaction with the schema inspected once up front.
+
+Usage:
+  python migrations.py upgrade   - Apply pending migrations
+  python migrations.py current   - Show the recorded schema version
+"""
+
+import sys
+from contextlib import contextmanager
+from datetime import datetime
+import sqlalchemy as sa
+from app import app, db
+
+VERSION_TABLE = 'schema_version'
+
+# Serialises concurrent upgrades from several workers on PostgreSQL
+ADVISORY_LOCK_ID = 7324001
+
+MIGRATIONS = []
+
+def migration(version, description):
+    """Register a migration step; steps run in version order"""
+    def register(func):
+        MIGRATIONS.append((version, description, func))
+        MIGRATIONS.sort(key=lambda entry: entry[0])
+        return func
+    return register
+
+class MigrationContext:
+    """Connection plus a schema snapshot shared by every pending migration"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        inspector = sa.inspect(conn)
+        tables = inspector.get_table_names()
+        self.columns = {table: {column['name'] for column in inspector.get_columns(table)}
+                        for table in tables}
+        self.indexes = {table: {index['name'] for index in inspector.get_indexes(table)}
+                        for table in tables}
+
+    def add_columns(self, table, *columns):
+        """Add whichever columns the table lacks.
+
+        PostgreSQL gets a single ALTER TABLE for all of them; SQLite only
+        accepts one column per ALTER, but adding a column never rewrites
+        the table there.
+        """
+        existing = self.columns.get(table)
+        if existing is None:
+            return []  # create_all() builds the table at the current schema
+        missing = [column for column in columns if column.name not in existing]
+        if not missing:
+            return []
+
+        sa.Table(table, sa.MetaData(), *missing)
+        dialect = self.conn.dialect
+        specs = [str(sa.schema.CreateColumn(column).compile(dialect=dialect)) for column in missing]
+        quoted_table = dialect.identifier_preparer.quote(table)
+        if dialect.name == 'sqlite':
+            for spec in specs:
+                self.conn.exec_driver_sql(f'ALTER TABLE {quoted_table} ADD COLUMN {spec}')
+        else:
+            self.conn.exec_driver_sql(
+                f'ALTER TABLE {quoted_table} ' + ', '.join(f'ADD COLUMN {spec}' for spec in specs))
+
+        existing.update(column.name for column in missing)
+        return [column.name for column in missing]
+
+    def create_indexes(self):
+        """Create the indexes declared on the models that the database lacks.
+
+        Indexes over columns a later migration adds are left for that
+        migration to create.
+        """
+        import models  # noqa: F401 - registers the tables on db.metadata
+        created = []
+        for table in db.metadata.sorted_tables:
+            existing = self.indexes.get(table.name)
+            if existing is None:
+                continue
+            columns = self.columns[table.name]
+            for index in sorted(table.indexes, key=lambda index: index.name):
+                if index.name not in existing and all(column.name in columns for column in index.columns):
+                    index.create(bind=self.conn)
+                    existing.add(index.name)
+                    created.append(index.name)
+        return created
+
+    def create_tables(self, *models):
+        """Create the tables of the given models that the database lacks"""
+        created = []
+        for model in models:
+            table = model.__table__
+            if table.name not in self.columns:
+                table.create(bind=self.conn)
+                self.columns[table.name] = {column.name for column in table.columns}
+                self.indexes[table.name] = {index.name for index in table.indexes}
+                created.append(table.name)
+        return created
+
+    def drop_index(self, table, name):
+        if name in self.indexes.get(table, ()):
+            self.conn.exec_driver_sql(f'DROP INDEX {self.conn.dialect.identifier_preparer.quote(name)}')
+            self.indexes[table].discard(name)
+
+    def has_column(self, table, column):
+        return column in self.columns.get(table, ())
+
+    def execute(self, sql, **params):
+        self.conn.execute(sa.text(sql), params)
+
+@migration(1, 'Company settings appearance, copyright and gallery columns')
+def appearance_columns(ctx):
+    ctx.add_columns(
+        'company_settings',
+        sa.Column('primary_color', sa.String(7), server_default='#28a745'),
+        sa.Column('secondary_color', sa.String(7), server_default='#6c757d'),
+        sa.Column('logo_url', sa.String(500), server_default=''),
+        sa.Column('copyright_text', sa.String(255),
+                  server_default='© 2024 Website by Fajar Julyana. All rights reserved.'),
+        sa.Column('layout_type', sa.String(50), server_default='standard'),
+        sa.Column('gallery_images', sa.Text, server_default=''),
+    )
+    ctx.execute("UPDATE company_settings SET copyright_text = :text "
+                "WHERE copyright_text IS NULL OR copyright_text = ''",
+                text='© 2024 Website by Fajar Julyana. All rights reserved.')
+
+@migration(2, 'Gallery display mode')
+def gallery_mode(ctx):
+    ctx.add_columns('company_settings', sa.Column('gallery_mode', sa.String(20), server_default='static'))
+
+@migration(3, 'Theme system')
+def theme_system(ctx):
+    ctx.add_columns(
+        'company_settings',
+        sa.Column('selected_theme', sa.String(50), server_default='nature_life'),
+        sa.Column('custom_primary_color', sa.String(7), server_default='#28a745'),
+        sa.Column('custom_secondary_color', sa.String(7), server_default='#6c757d'),
+        sa.Column('custom_accent_color', sa.String(7), server_default='#17a2b8'),
+        sa.Column('theme_mode', sa.String(20), server_default='preset'),
+    )
+    ctx.execute("UPDATE company_settings SET selected_theme = 'nature_life' WHERE selected_theme IS NULL")
+    ctx.execute("UPDATE company_settings SET theme_mode = 'preset' WHERE theme_mode IS NULL")
+
+@migration(4, 'updated_at on categories and company settings')
+def updated_at_columns(ctx):
+    if ctx.add_columns('category', sa.Column('updated_at', sa.DateTime)):
+        ctx.execute("UPDATE category SET updated_at = created_at")
+    ctx.add_columns('company_settings', sa.Column('updated_at', sa.DateTime))
+
+@migration(5, 'Indexes for catalog, order and shipping filters')
+def hot_filter_indexes(ctx):
+    ctx.create_indexes()
+
+@migration(6, 'Order currency')
+def order_currency(ctx):
+    # Orders placed before this were totalled in the visitor's currency
+    # without recording it; the dashboard has always shown them as USD.
+    ctx.add_columns('order', sa.Column('currency', sa.String(3), server_default='USD'))
+
+@migration(7, 'Dashboard statistics, sales rollup and covering order index')
+def sales_rollup(ctx):
+    from models import DashboardStats, DailyRevenue, DailyProductSales
+    ctx.create_tables(DashboardStats, DailyRevenue, DailyProductSales)
+    ctx.drop_index('order', 'ix_order_status_created')
+    ctx.create_indexes()
+    # init_database() runs create_all() first, so the rollup table usually
+    # exists already, just empty: fill it from the orders placed so far
+    empty = ctx.conn.execute(sa.select(DailyProductSales.day).limit(1)).first() is None
+    if empty and 'order' in ctx.columns:
+        from analytics import rebuild_product_sales_statement
+        ctx.conn.execute(rebuild_product_sales_statement())
+
+@migration(8, 'Product SKU')
+def product_sku(ctx):
+    ctx.add_columns('product', sa.Column('sku', sa.String(64)))
+    ctx.create_indexes()
+
+@migration(9, 'Dated exchange rates')
+def exchange_rates(ctx):
+    # Until a rate is stored, exchange_rates falls back to its DEFAULT_RATES
+    from models import ExchangeRate
+    ctx.create_tables(ExchangeRate)
+
+@migration(10, 'Server-side carts')
+def server_side_carts(ctx):
+    from models import Cart
+    ctx.create_tables(Cart)
+
+@contextmanager
+def _transaction(engine):
+    """A connection holding one write-locked transaction, DDL included"""
+    with engine.connect() as conn:
+        if conn.dialect.name == 'sqlite':
+            # pysqlite commits on its own before DDL statements, so take over
+            # transaction control for the duration of the upgrade.
+            driver_connection = conn.connection.driver_connection
+            isolation_level = driver_connection.isolation_level
+            driver_connection.isolation_level = None
+            conn.exec_driver_sql('BEGIN IMMEDIATE')
+            try:
+                yield conn
+                conn.exec_driver_sql('COMMIT')
+            except BaseException:
+                conn.exec_driver_sql('ROLLBACK')
+                raise
+            finally:
+                driver_connection.isolation_level = isolation_level
+        else:
+            with conn.begin():
+                if conn.dialect.name == 'postgresql':
+                    conn.execute(sa.text('SELECT pg_advisory_xact_lock(:id)'), {'id': ADVISORY_LOCK_ID})
+                yield conn
+
+def _version_table():
+    return sa.Table(
+        VERSION_TABLE, sa.MetaData(),
+        sa.Column('version', sa.Integer, primary_key=True, autoincrement=False),
+        sa.Column('description', sa.String(200)),
+        sa.Column('applied_at', sa.DateTime),
+    )
+
+def current_version(conn):
+    """Highest applied migration, 0 for a database that never ran one"""
+    if not sa.inspect(conn).has_table(VERSION_TABLE):
+        return 0
+    return conn.execute(sa.select(sa.func.max(_version_table().c.version))).scalar() or 0
+
+def head_version():
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+def upgrade(engine=None):
+    """Apply pending migrations and return the versions applied"""
+    engine = engine or db.engine
+
+    with engine.connect() as conn:
+        if current_version(conn) >= head_version():
+            return []
+
+    applied = []
+    with _transaction(engine) as conn:
+        version_table = _version_table()
+        version_table.create(bind=conn, checkfirst=True)
+        # Re-read under the lock: another worker may have upgraded meanwhile
+        version = current_version(conn)
+        pending = [entry for entry in MIGRATIONS if entry[0] > version]
+        if not pending:
+            return []
+
+        ctx = MigrationContext(conn)
+        for number, description, func in pending:
+            func(ctx)
+            conn.execute(version_table.insert().values(
+                version=number, description=description, applied_at=datetime.utcnow()))
+            applied.append(number)
+    return applied
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else 'upgrade'
+
+    with app.app_context():
+        if command == 'upgrade':
+            applied = upgrade()
+            for number, description, _ in MIGRATIONS:
+                if number in applied:
+                    print(f"✓ Applied migration {number}: {description}")
+            with db.engine.connect() as conn:
+                print(f"✓ Schema is at version {current_version(conn)}")
+        elif command == 'current':
+            with db.engine.connect() as conn:
+                print(f"Schema version {current_version(conn)} (latest {head_version()})")
+        else:
+            print("Available commands:")
+            print("  python migrations.py upgrade - Apply pending migrations")
+            print("  python migrations.py current - Show the recorded schema version")
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,7 @@ from app import db
 from flask_login import UserMixin
 from datetime import datetime
 from sqlalchemy import func
+from sqlalchemy.orm import query_expression
 
 class Admin(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -18,32 +19,47 @@ class Category(db.Model):
     description_en = db.Column(db.Text)
     description_id = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationship
     products = db.relationship('Product', back_populates='category', lazy=True)
 
+    # Filled in by queries.categories_with_product_counts()
+    product_count = query_expression()
+
 class Product(db.Model):
     __tablename__ = 'product'
+    __table_args__ = (
+        db.Index('ix_product_available_category', 'is_available', 'category_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
+    sku = db.Column(db.String(64), unique=True, index=True)  # Price list key for bulk imports
     name_en = db.Column(db.String(200), nullable=False)
     name_id = db.Column(db.String(200), nullable=False)
     description_en = db.Column(db.Text)
     description_id = db.Column(db.Text)
     price_usd = db.Column(db.Numeric(10, 2), nullable=False)
     price_idr = db.Column(db.Numeric(15, 2), nullable=False)
-    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False, index=True)
     stock_quantity = db.Column(db.Integer, default=0)
     min_order_quantity = db.Column(db.Integer, default=1)
     unit = db.Column(db.String(50), default='kg')
     image_url = db.Column(db.String(500))
     is_available = db.Column(db.Boolean, default=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationship
     category = db.relationship('Category', back_populates='products')
 
 class Order(db.Model):
+    __table_args__ = (
+        # Covers the admin status filter and the analytics order aggregates
+        db.Index('ix_order_sales', 'status', 'created_at', 'is_international', 'currency',
+                 'total_amount', 'customer_country'),
+        db.Index('ix_order_shipping', 'shipping_status', 'is_international', 'shipping_date'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     order_number = db.Column(db.String(50), unique=True, nullable=False)
     customer_name = db.Column(db.String(100), nullable=False)
@@ -53,6 +69,7 @@ class Order(db.Model):
     customer_country = db.Column(db.String(100), nullable=False)
     shipping_address = db.Column(db.Text, nullable=False)
     total_amount = db.Column(db.Float, nullable=False)
+    currency = db.Column(db.String(3), default='USD')  # Currency total_amount is in
     status = db.Column(db.String(20), nullable=False, default='pending')
     notes = db.Column(db.Text)
     admin_notes = db.Column(db.Text)
@@ -66,7 +83,7 @@ class Order(db.Model):
     is_international = db.Column(db.Boolean, default=False)
     shipping_status = db.Column(db.String(20), default='not_shipped')
 
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationship with order items
@@ -74,8 +91,8 @@ class Order(db.Model):
 
 class OrderItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
-    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False, index=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False, index=True)
     quantity = db.Column(db.Integer, nullable=False)
     unit_price = db.Column(db.Float, nullable=False)
     total_price = db.Column(db.Float, nullable=False)
@@ -94,7 +111,7 @@ class CompanySettings(db.Model):
     contact_whatsapp = db.Column(db.String(50), default='+62-812-3456-7890')
     address_en = db.Column(db.Text, default='Jakarta, Indonesia')
     address_id = db.Column(db.Text, default='Jakarta, Indonesia')
-    exchange_rate = db.Column(db.Float, default=15000.0)  # USD to IDR exchange rate
+    exchange_rate = db.Column(db.Float, default=15000.0)  # Unused; rates live in ExchangeRate
     default_currency = db.Column(db.String(3), default='USD')  # USD or IDR
     # Appearance settings
     primary_color = db.Column(db.String(7), default='#28a745')  # Green color
@@ -114,5 +131,74 @@ class CompanySettings(db.Model):
     custom_accent_color = db.Column(db.String(7), default='#17a2b8')
     theme_mode = db.Column(db.String(20), default='preset')  # preset or custom
 
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @property
+    def gallery_list(self):
+        """Gallery image URLs in display order, skipping blanks"""
+        return [url.strip() for url in (self.gallery_images or '').split(',') if url.strip()]
+
+    @property
+    def theme_colors(self):
+        """Custom palette with the form defaults applied"""
+        return {
+            'primary': self.custom_primary_color or '#28a745',
+            'secondary': self.custom_secondary_color or '#6c757d',
+            'accent': self.custom_accent_color or '#17a2b8',
+        }
+
+    def localized(self, lang):
+        """Company texts for a language (anything but 'en' falls back to Indonesian)"""
+        suffix = 'en' if lang == 'en' else 'id'
+        return {
+            'company_name': getattr(self, f'company_name_{suffix}'),
+            'company_description': getattr(self, f'company_description_{suffix}'),
+            'address': getattr(self, f'address_{suffix}'),
+        }
+
     def __repr__(self):
-        return f'<CompanySettings {self.company_name_en}>'
\ No newline at end of file
+        return f'<CompanySettings {self.company_name_en}>'
+
+class DashboardStats(db.Model):
+    """Admin dashboard totals, kept current by dashboard_stats on every write"""
+    __tablename__ = 'dashboard_stats'
+    id = db.Column(db.Integer, primary_key=True)
+    total_products = db.Column(db.Integer, nullable=False, default=0)
+    total_orders = db.Column(db.Integer, nullable=False, default=0)
+    pending_orders = db.Column(db.Integer, nullable=False, default=0)
+    total_revenue = db.Column(db.Float, nullable=False, default=0.0)
+    reconciled_at = db.Column(db.DateTime)
+
+class DailyRevenue(db.Model):
+    """Revenue of the orders counted in DashboardStats.total_revenue, per order day and currency"""
+    __tablename__ = 'daily_revenue'
+    day = db.Column(db.Date, primary_key=True)
+    currency = db.Column(db.String(3), primary_key=True)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+
+class DailyProductSales(db.Model):
+    """Order items of sales orders (analytics.SALES_STATUSES) per order day, product and currency"""
+    __tablename__ = 'daily_product_sales'
+    day = db.Column(db.Date, primary_key=True)
+    product_id = db.Column(db.Integer, primary_key=True)
+    currency = db.Column(db.String(3), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+
+class ExchangeRate(db.Model):
+    """Rupiah per unit of a currency, in effect from effective_date until the next rate"""
+    __tablename__ = 'exchange_rate'
+    currency = db.Column(db.String(3), primary_key=True)
+    effective_date = db.Column(db.Date, primary_key=True)
+    rate = db.Column(db.Float, nullable=False)
+    source = db.Column(db.String(100), default='manual')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class Cart(db.Model):
+    """A cart kept server-side (CART_STORE = 'database'), keyed by the id in the visitor's session"""
+    __tablename__ = 'cart'
+    id = db.Column(db.String(32), primary_key=True)
+    items = db.Column(db.Text, nullable=False, default='')
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
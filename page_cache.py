@@ -0,0 +1,110 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import request, session, g, make_response
+from app import app
+from preferences import get_preferences
+from cart_store import has_cart
+from exchange_rates import rates_stamp
+
+# Rendered public catalog pages, keyed by (catalog version, exchange rates,
+# lang, currency, URL). Admin write paths call bump_catalog_version() after committing, which
+# drops every cached page in this process; other workers expire their copies
+# after PAGE_CACHE_TTL seconds. Each entry also keeps the ETag and
+# Last-Modified http_cache computed for it, so revalidating a cached page
+# does not touch the database either.
+DEFAULT_PAGE_CACHE_SIZE = 256
+DEFAULT_PAGE_CACHE_TTL = 60
+
+_catalog_version = 0
+
+class PageCache:
+    """Thread-safe LRU of rendered responses with per-entry expiry"""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, ttl):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] >= ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, max_entries):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+page_cache = PageCache()
+
+def catalog_version():
+    return _catalog_version
+
+def bump_catalog_version():
+    """Invalidate cached pages; call after committing a product, category or settings change"""
+    global _catalog_version
+    _catalog_version += 1
+    page_cache.clear()
+
+def _page_key():
+    lang, currency = get_preferences()
+    return (_catalog_version, rates_stamp()[1], lang, currency, request.full_path)
+
+def cached_validators():
+    """(etag, last modified) stored with this request's cached page, or None"""
+    if not app.config.get('PAGE_CACHE_ENABLED', True):
+        return None
+    cached = page_cache.get(_page_key(), app.config.get('PAGE_CACHE_TTL', DEFAULT_PAGE_CACHE_TTL))
+    return cached[2] if cached is not None else None
+
+def is_cacheable_request():
+    """True when the response carries nothing specific to this visitor"""
+    # Pages show the cart badge, customer name, admin menu and flashed
+    # messages, so only visitors without any of those share cached copies.
+    return (request.method == 'GET'
+            and not has_cart()
+            and not session.get('is_logged_in')
+            and '_user_id' not in session
+            and '_flashes' not in session)
+
+def cached_page(view):
+    """Serve a public page from memory for anonymous visitors"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not app.config.get('PAGE_CACHE_ENABLED', True) or not is_cacheable_request():
+            return view(*args, **kwargs)
+
+        key = _page_key()
+        ttl = app.config.get('PAGE_CACHE_TTL', DEFAULT_PAGE_CACHE_TTL)
+
+        cached = page_cache.get(key, ttl)
+        if cached is not None:
+            body, content_type, _ = cached
+            response = app.response_class(body, content_type=content_type)
+            response.headers['X-Page-Cache'] = 'hit'
+            return response
+
+        response = make_response(view(*args, **kwargs))
+        if response.status_code == 200 and not response.is_streamed:
+            # http_cache.conditional_page leaves the validators it computed in g
+            page_cache.set(key, (response.get_data(), response.content_type, g.get('page_validators')),
+                           app.config.get('PAGE_CACHE_SIZE', DEFAULT_PAGE_CACHE_SIZE))
+            response.headers['X-Page-Cache'] = 'miss'
+        return response
+    return wrapper
@@ -0,0 +1,126 @@
+import json
+import base64
+from datetime import datetime
+from sqlalchemy import and_, or_
+from app import app, db
+
+# Keyset ("seek") pagination for the admin lists. A page is fetched with
+# WHERE (sort key, id) < (cursor) ORDER BY sort key, id LIMIT n, so page 500
+# reads the same handful of index entries as page 1 instead of counting
+# and skipping every row before it.
+DEFAULT_PER_PAGE = 10
+
+# Totals are counted up to this many rows; beyond it PostgreSQL reports the
+# planner's estimate and SQLite shows "1000+".
+TOTAL_COUNT_LIMIT = 1000
+
+def encode_cursor(values):
+    payload = json.dumps([value.isoformat() if isinstance(value, datetime) else value
+                          for value in values])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """(sort key, id) from a cursor string, or None if it is missing or malformed"""
+    if not cursor:
+        return None
+    try:
+        key, row_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return (datetime.fromisoformat(key) if key is not None else None), int(row_id)
+    except (ValueError, TypeError):
+        return None
+
+def _after(column, id_column, key, row_id, nullable):
+    """Rows that come after (key, row_id) in `column DESC NULLS LAST, id DESC` order"""
+    if key is None:
+        return and_(column.is_(None), id_column < row_id)
+    condition = or_(column < key, and_(column == key, id_column < row_id))
+    return or_(condition, column.is_(None)) if nullable else condition
+
+def _before(column, id_column, key, row_id, nullable):
+    """Rows that come before (key, row_id) in the same order"""
+    if key is None:
+        return or_(column.isnot(None), and_(column.is_(None), id_column > row_id))
+    return or_(column > key, and_(column == key, id_column > row_id))
+
+class KeysetPage:
+    """One page of a keyset-paginated list with cursors to its neighbours"""
+
+    def __init__(self, items, next_cursor, prev_cursor, total_query):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self._total_query = total_query
+        self._total = None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    @property
+    def total(self):
+        """Approximate row count as a display string, e.g. "42", "1000+" or "~52,310" """
+        if self._total is None and self._total_query is not None:
+            self._total = approximate_total(self._total_query)
+        return self._total
+
+def approximate_total(query):
+    """Row count of a query, exact up to TOTAL_COUNT_LIMIT rows"""
+    count = db.session.execute(
+        db.select(db.func.count()).select_from(query.order_by(None).limit(TOTAL_COUNT_LIMIT + 1).subquery())
+    ).scalar()
+    if count <= TOTAL_COUNT_LIMIT:
+        return f'{count:,}'
+    if db.engine.dialect.name == 'postgresql':
+        sql, params = _explain_sql(query.order_by(None).statement, db.engine.dialect)
+        plan = db.session.connection().exec_driver_sql(sql, params).scalar()
+        return f"~{max(plan[0]['Plan']['Plan Rows'], count):,}"
+    return f'{TOTAL_COUNT_LIMIT:,}+'
+
+def _explain_sql(statement, dialect):
+    """EXPLAIN (FORMAT JSON) SQL and parameters for a statement, with IN lists expanded"""
+    # Expanding IN parameters otherwise compile to a __[POSTCOMPILE_...]
+    # placeholder that only SQLAlchemy's own execute() fills in
+    compiled = statement.compile(dialect=dialect, compile_kwargs={'render_postcompile': True})
+    return f'EXPLAIN (FORMAT JSON) {compiled}', compiled.params
+
+def keyset_paginate(query, column, id_column, after=None, before=None,
+                    per_page=DEFAULT_PER_PAGE, nullable=False):
+    """A KeysetPage of `query` ordered newest first by (column, id_column).
+
+    `after` and `before` are cursors from a previous page's next_cursor and
+    prev_cursor. Set `nullable` when rows may have no sort key; they are
+    listed last.
+    """
+    base_query = query.order_by(None)
+    after_key, before_key = decode_cursor(after), decode_cursor(before)
+
+    if before_key is not None:
+        # Walk backwards from the cursor, then restore newest-first order
+        rows = (base_query.filter(_before(column, id_column, *before_key, nullable))
+                .order_by(column.asc().nullsfirst() if nullable else column.asc(), id_column.asc())
+                .limit(per_page + 1).all())
+        has_more_before = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        has_more_after = True
+    else:
+        if after_key is not None:
+            base = base_query.filter(_after(column, id_column, *after_key, nullable))
+        else:
+            base = base_query
+        rows = (base.order_by(column.desc().nullslast() if nullable else column.desc(), id_column.desc())
+                .limit(per_page + 1).all())
+        has_more_after = len(rows) > per_page
+        items = rows[:per_page]
+        has_more_before = after_key is not None
+
+    def cursor_for(item):
+        return encode_cursor([getattr(item, column.key), getattr(item, id_column.key)])
+
+    next_cursor = cursor_for(items[-1]) if items and has_more_after else None
+    prev_cursor = cursor_for(items[0]) if items and has_more_before else None
+    total_query = query if app.config.get('ADMIN_LIST_TOTALS', True) else None
+    return KeysetPage(items, next_cursor, prev_cursor, total_query)
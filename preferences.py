@@ -0,0 +1,79 @@
+from flask import request, session, g
+
+# Language and currency are resolved once per request. A preference is only
+# stored in the session when it differs from what is stored, so browsing
+# never re-signs the session cookie. First-time visitors get a guess from
+# their request headers, which is stored right away: every later request
+# reads the session and its response only varies on Cookie. The response
+# that made the guess sets the cookie, so it is private; it still lists the
+# main detection headers in Vary for the browser's own cache.
+DETECTION_HEADERS = ('Accept-Language', 'Timezone')
+
+def detect_user_location():
+    """Detect user location from request headers and IP"""
+    # Check Accept-Language header first
+    accept_language = request.headers.get('Accept-Language', '')
+
+    # Indonesian language detection
+    if any(lang in accept_language.lower() for lang in ['id-id', 'id,', 'id;', 'indonesia']):
+        return 'id', 'IDR'
+
+    # Check for other Asian countries that might prefer IDR
+    asia_countries = ['th-th', 'vi-vn', 'ms-my', 'tl-ph']
+    if any(country in accept_language.lower() for country in asia_countries):
+        return 'id', 'IDR'
+
+    # Check timezone header for Indonesia timezone
+    timezone = request.headers.get('Timezone', '')
+    if 'asia/jakarta' in timezone.lower() or 'wib' in timezone.lower():
+        return 'id', 'IDR'
+
+    # Check User-Agent for Indonesian/Asian keywords
+    user_agent = request.headers.get('User-Agent', '').lower()
+    if any(keyword in user_agent for keyword in ['indonesia', 'jakarta', 'id-', 'asia']):
+        return 'id', 'IDR'
+
+    # Default to English/USD for international users
+    return 'en', 'USD'
+
+def remember_preference(key, value):
+    """Store a preference in the session unless it is already stored"""
+    if session.get(key) != value:
+        session[key] = value
+
+def get_preferences(detect=True):
+    """Resolve (lang, currency) for this request.
+
+    Query args win over the session; with `detect`, a language or currency
+    missing from both is guessed from the request headers and stored.
+    """
+    if 'preferences' in g:
+        return g.preferences
+
+    lang, currency = session.get('lang'), session.get('currency')
+    missing = not (lang or request.args.get('lang')) or not (currency or request.args.get('currency'))
+    if detect and missing:
+        detected_lang, detected_currency = detect_user_location()
+        lang, currency = lang or detected_lang, currency or detected_currency
+        remember_preference('lang', lang)
+        remember_preference('currency', currency)
+        g.preferences_detected = True
+
+    lang = request.args.get('lang', lang or 'en')
+    currency = request.args.get('currency', currency or 'USD')
+    for key in ('lang', 'currency'):
+        if key in request.args:
+            remember_preference(key, request.args[key])
+
+    g.preferences = (lang, currency)
+    return g.preferences
+
+def vary_on_preferences(response):
+    """Add the request headers this response's language and currency depend on to Vary"""
+    if 'preferences' in g:
+        response.vary.add('Cookie')
+        if g.get('preferences_detected'):
+            response.vary.update(DETECTION_HEADERS)
+            response.cache_control.public = False
+            response.cache_control.private = True
+    return response
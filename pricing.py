@@ -0,0 +1,141 @@
+from collections import namedtuple
+from models import Product
+from exchange_rates import get_rate, current_rates
+
+# A product's price as a listing shows it: the amount in the visitor's
+# currency and in the IDR base, each with its formatted text
+DisplayPrice = namedtuple('DisplayPrice', 'amount text base base_text')
+
+def format_currency(amount, currency='USD', lang='en'):
+    """Format currency based on language and currency type"""
+    # Handle None, undefined, or invalid values
+    if amount is None or str(amount).lower() in ['none', 'undefined', '']:
+        amount = 0
+    
+    try:
+        amount = float(amount)
+    except (ValueError, TypeError):
+        amount = 0
+    
+    if currency == 'IDR':
+        # Indonesian Rupiah formatting
+        return f"Rp.{amount:,.0f}"
+    else:
+        # USD formatting
+        return f"${amount:,.2f}"
+
+def get_product_price(product, currency='USD'):
+    """Get product price in specified currency with IDR as base currency"""
+    try:
+        # IDR is the base currency - always use price_idr field as the source of truth
+        if hasattr(product, 'price_idr') and product.price_idr is not None:
+            base_price_idr = float(product.price_idr)
+        else:
+            # Fallback: if price_idr is not available, check price_usd and convert
+            if hasattr(product, 'price_usd') and product.price_usd is not None:
+                base_price_idr = float(product.price_usd) * get_rate('USD')
+            else:
+                return 0
+
+        if currency == 'IDR':
+            return base_price_idr
+        rate = current_rates().get(currency)
+        if rate is None:
+            return base_price_idr  # For other currencies, add a rate for them
+        return base_price_idr / rate
+
+    except (ValueError, TypeError, AttributeError, KeyError) as e:
+        print(f"Error in get_product_price: {e}")
+        return 0
+
+def convert_currency(amount, from_currency, to_currency):
+    """Convert amount between currencies with IDR as base"""
+    if from_currency == to_currency:
+        return amount
+
+    # Convert everything through IDR as base currency; the rates are cached
+    rates = current_rates()
+    if from_currency not in rates or to_currency not in rates:
+        return amount  # If other currency needed, add a rate for it
+    return float(amount) * rates[from_currency] / rates[to_currency]
+
+def price_products(products, currency='USD', lang='en'):
+    """{product id: DisplayPrice} for every product on a page, priced in one pass.
+
+    The rates are read once for the whole list and each price is formatted
+    here, so the templates only look prices up instead of calling
+    get_product_price and format_currency per product. Amounts match
+    get_product_price, including its fallbacks.
+    """
+    rates = current_rates()
+    rate = rates.get(currency) or 1.0  # no rate for the currency: show the IDR base
+    usd_rate = rates['USD']
+
+    prices = {}
+    for product in products:
+        if product.id in prices:
+            continue
+        if product.price_idr is not None:
+            base = float(product.price_idr)
+        elif product.price_usd is not None:
+            base = float(product.price_usd) * usd_rate
+        else:
+            base = 0.0
+        amount = base / rate
+        prices[product.id] = DisplayPrice(amount, format_currency(amount, currency, lang),
+                                          base, format_currency(base, 'IDR', lang))
+    return prices
+
+class PricedCart:
+    """Cart lines resolved against the catalog and priced in one currency.
+
+    `items` keeps the dict shape the cart and checkout templates expect
+    (product, quantity, price, item_total/total).
+    """
+
+    def __init__(self, items, currency):
+        self.items = items
+        self.currency = currency
+        self.total = sum(item['item_total'] for item in items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+def price_cart(cart, currency='USD'):
+    """Price a session cart ({product_id: quantity}) with a single product query.
+
+    Unknown or unavailable products are skipped, as the per-line lookups did.
+    """
+    quantities = {}
+    for product_id, quantity in (cart or {}).items():
+        try:
+            quantities[int(product_id)] = quantity
+        except (TypeError, ValueError):
+            continue
+
+    products = {}
+    if quantities:
+        products = {product.id: product
+                    for product in Product.query.filter(Product.id.in_(quantities)).all()}
+
+    items = []
+    for product_id, quantity in quantities.items():
+        product = products.get(product_id)
+        if product and product.is_available:
+            price = get_product_price(product, currency)
+            item_total = price * quantity
+            items.append({
+                'product': product,
+                'quantity': quantity,
+                'price': price,
+                'item_total': item_total,
+                'total': item_total
+            })
+
+    return PricedCart(items, currency)
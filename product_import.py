@@ -0,0 +1,256 @@
+import io
+import csv
+import json
+import math
+from datetime import datetime
+from app import db
+from models import Product, Category
+from validation import sanitize_text
+from exchange_rates import get_rate
+import search_index
+import dashboard_stats
+
+# Bulk product import and price updates from CSV or JSON. Rows are validated
+# with the same rules as the admin product form (sanitize_text, prices in IDR
+# with USD derived from them), then written with one executemany per batch
+# of IMPORT_BATCH_SIZE rows: bulk INSERT for new products, bulk UPDATE by
+# primary key for existing ones. A row updates an existing product when its
+# `id` or `sku` matches one; otherwise it creates a product. Invalid rows are
+# reported with their row number and skipped; the caller commits the rest as
+# one transaction.
+IMPORT_BATCH_SIZE = 1000
+
+# Column names accepted in a file, with the Product attribute they set
+COLUMN_ALIASES = {'price': 'price_idr', 'category_name': 'category'}
+COLUMNS = ('id', 'sku', 'name_en', 'name_id', 'description_en', 'description_id', 'price_idr',
+           'unit', 'stock_quantity', 'min_order_quantity', 'category_id', 'category',
+           'image_url', 'is_available')
+REQUIRED_FOR_NEW = ('name_en', 'name_id', 'price_idr', 'category_id')
+
+# Changing any of these refreshes the product's search index row
+INDEXED_COLUMNS = {'name_en', 'name_id', 'description_en', 'description_id', 'category_id'}
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'on'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'off'}
+
+class ImportResult:
+    """Counts and per-row errors from import_products()"""
+
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.errors = []  # (row number, message)
+
+    def error(self, row_number, message):
+        self.errors.append((row_number, message))
+
+    @property
+    def applied(self):
+        return self.inserted + self.updated
+
+def read_rows(stream, filename):
+    """(row number, {column: value}) pairs from an uploaded CSV or JSON file.
+
+    JSON is a list of objects, or an object with a "products" list; other
+    list items are passed on for _parse_row() to report. Blank CSV cells
+    are dropped so they leave the product's value unchanged.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        if filename.lower().endswith('.json'):
+            data = json.load(text)
+            if isinstance(data, dict):
+                data = data.get('products', [])
+            if not isinstance(data, list):
+                raise ValueError('JSON import must be a list of products')
+            for row_number, row in enumerate(data, start=1):
+                yield row_number, row
+        else:
+            for row_number, row in enumerate(csv.DictReader(text), start=2):  # row 1 is the header
+                yield row_number, {key: value for key, value in row.items()
+                                   if key is not None and value not in (None, '')}
+    finally:
+        text.detach()  # leave the caller's stream open
+
+def _text(value, column):
+    text = sanitize_text(str(value)) or ''
+    limit = getattr(Product.__table__.c[column].type, 'length', None)
+    if limit and len(text) > limit:
+        raise ValueError(f'{column} is longer than {limit} characters')
+    return text
+
+def _number(value, column):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{column} must be a number, got {value!r}')
+    if not math.isfinite(number) or number < 0:
+        raise ValueError(f'{column} must be zero or more')
+    return number
+
+def _integer(value, column):
+    try:
+        number = value if isinstance(value, int) else int(str(value).strip())
+    except ValueError:
+        raise ValueError(f'{column} must be a whole number, got {value!r}')
+    if number < 0:
+        raise ValueError(f'{column} must be zero or more')
+    return number
+
+def _boolean(value, column):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise ValueError(f'{column} must be yes or no, got {value!r}')
+
+def _parse_row(raw, categories):
+    """Validated Product column values from one input row; raises ValueError"""
+    if not isinstance(raw, dict):
+        raise ValueError('row must be a JSON object')
+    values = {}
+    for key, value in raw.items():
+        column = str(key).strip().lower()
+        column = COLUMN_ALIASES.get(column, column)
+        if column not in COLUMNS:
+            raise ValueError(f'unknown column {key!r}')
+        if value is None or (isinstance(value, str) and not value.strip()):
+            continue
+
+        if column in ('id', 'stock_quantity', 'min_order_quantity', 'category_id'):
+            values[column] = _integer(value, column)
+        elif column == 'price_idr':
+            values[column] = _number(value, column)
+        elif column == 'is_available':
+            values[column] = _boolean(value, column)
+        elif column == 'category':
+            name = sanitize_text(str(value)).lower()
+            if name not in categories['names']:
+                raise ValueError(f'no category named {value!r}')
+            values.setdefault('category_id', categories['names'][name])
+        else:
+            values[column] = _text(value, column)
+
+    if 'category_id' in values and values['category_id'] not in categories['ids']:
+        raise ValueError(f"no category with id {values['category_id']}")
+    if values.get('min_order_quantity') == 0:
+        raise ValueError('min_order_quantity must be at least 1')
+    for column in ('name_en', 'name_id', 'sku'):
+        if column in values and not values[column]:
+            raise ValueError(f'{column} is empty after removing unsupported characters')
+    if 'price_idr' in values:
+        # IDR is the base currency; the USD price is derived, as in the admin form
+        values['price_usd'] = round(values['price_idr'] / get_rate('USD'), 2)
+    return values
+
+def _category_lookup():
+    ids, names = set(), {}
+    for category_id, name_en, name_id in db.session.execute(
+            db.select(Category.id, Category.name_en, Category.name_id)):
+        ids.add(category_id)
+        for name in (name_en, name_id):
+            if name:
+                names.setdefault(name.lower(), category_id)
+    return {'ids': ids, 'names': names}
+
+def _existing(column, keys):
+    """{key: product id} for the products whose `column` is one of `keys`"""
+    found = {}
+    keys = list(keys)
+    for start in range(0, len(keys), IMPORT_BATCH_SIZE):
+        found.update(db.session.execute(
+            db.select(column, Product.id).where(column.in_(keys[start:start + IMPORT_BATCH_SIZE]))
+        ).all())
+    return found
+
+def _batches(rows):
+    for start in range(0, len(rows), IMPORT_BATCH_SIZE):
+        yield rows[start:start + IMPORT_BATCH_SIZE]
+
+def import_products(rows, dry_run=False):
+    """Validate and upsert (row number, values) pairs; the caller commits.
+
+    With dry_run the rows are only validated and matched against the
+    catalog, and nothing is written.
+    """
+    result = ImportResult(dry_run)
+    categories = _category_lookup()
+
+    parsed = []
+    first_row = {}
+    for row_number, raw in rows:
+        result.rows += 1
+        try:
+            values = _parse_row(raw, categories)
+        except ValueError as e:
+            result.error(row_number, str(e))
+            continue
+        key = ('id', values['id']) if 'id' in values else ('sku', values.get('sku'))
+        if key[1] is not None:
+            if key in first_row:
+                result.error(row_number, f'same {key[0]} as row {first_row[key]}')
+                continue
+            first_row[key] = row_number
+        parsed.append((row_number, values))
+
+    existing_ids = _existing(Product.id, {values['id'] for _, values in parsed if 'id' in values})
+    sku_owners = _existing(Product.sku, {values['sku'] for _, values in parsed if 'sku' in values})
+
+    now = datetime.utcnow()
+    inserts, updates = [], []
+    for row_number, values in parsed:
+        product_id = values.pop('id', None)
+        if product_id is not None and product_id not in existing_ids:
+            result.error(row_number, f'no product with id {product_id}')
+            continue
+        if product_id is None:
+            product_id = sku_owners.get(values.get('sku'))
+        elif sku_owners.get(values.get('sku'), product_id) != product_id:
+            result.error(row_number, f"sku {values['sku']!r} belongs to product {sku_owners[values['sku']]}")
+            continue
+
+        if product_id is not None:
+            updates.append(dict(values, id=product_id, updated_at=now))
+            continue
+        missing = [column for column in REQUIRED_FOR_NEW if column not in values]
+        if missing:
+            result.error(row_number, f"new product is missing {', '.join(missing)}")
+            continue
+        inserts.append({
+            'sku': None, 'description_en': '', 'description_id': '', 'unit': 'kg',
+            'stock_quantity': 0, 'min_order_quantity': 1, 'image_url': '', 'is_available': True,
+            **values, 'created_at': now, 'updated_at': now,
+        })
+
+    result.inserted, result.updated = len(inserts), len(updates)
+    result.errors.sort()
+    if dry_run:
+        return result
+
+    reindex = [row['id'] for row in updates if INDEXED_COLUMNS & row.keys()]
+    for batch in _batches(inserts):
+        reindex.extend(db.session.execute(
+            db.insert(Product).returning(Product.id, sort_by_parameter_order=True), batch
+        ).scalars())
+    for batch in _batches(updates):
+        db.session.execute(db.update(Product), batch)
+
+    search_index.index_products(reindex)
+    dashboard_stats.record_products_added(len(inserts))
+    return result
+
+def sync_usd_prices(rate=None):
+    """Re-derive price_usd from price_idr where they disagree; returns the rows changed"""
+    rate = rate or get_rate('USD')
+    price_usd = db.func.round(Product.price_idr / rate, 2)
+    return db.session.execute(
+        db.update(Product)
+        .where(db.func.abs(db.func.coalesce(Product.price_usd, 0) - price_usd) > 0.01)
+        .values(price_usd=price_usd, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount
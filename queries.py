@@ -0,0 +1,68 @@
+from sqlalchemy.orm import joinedload, selectinload, with_expression
+from app import db
+from models import Product, Category, Order, OrderItem
+from search_index import search_products
+
+# Loading strategies per view. Every listing resolves its relationships up
+# front so a page issues the same number of statements however many rows it
+# shows.
+
+def _product_count_subquery():
+    return (db.select(db.func.count(Product.id))
+            .where(Product.category_id == Category.id)
+            .correlate(Category)
+            .scalar_subquery())
+
+def with_category(query):
+    """Load Product.category in the same SELECT"""
+    return query.options(joinedload(Product.category))
+
+def featured_products(limit=6):
+    """Available products for the home page, with their category"""
+    return with_category(Product.query.filter_by(is_available=True)).limit(limit).all()
+
+def catalog_products(category_id=None):
+    """Base query for the public catalog, with categories joined"""
+    query = with_category(Product.query.filter_by(is_available=True))
+    if category_id:
+        query = query.filter_by(category_id=category_id)
+    return query
+
+def product_detail_or_404(product_id):
+    """A single product with its category"""
+    return with_category(Product.query).filter(Product.id == product_id).first_or_404()
+
+def related_products(product, limit=4):
+    """Other available products from the same category"""
+    return Product.query.filter_by(
+        category_id=product.category_id,
+        is_available=True
+    ).filter(Product.id != product.id).limit(limit).all()
+
+def admin_products(search='', category_id=None):
+    """Base query for the admin product table"""
+    query = with_category(Product.query)
+    if search:
+        query = search_products(query, search, ranked=False)
+    if category_id:
+        query = query.filter_by(category_id=category_id)
+    return query.order_by(Product.created_at.desc())
+
+def categories_with_product_counts(search=''):
+    """Base query for the admin category table with Category.product_count filled in"""
+    query = Category.query.options(with_expression(Category.product_count, _product_count_subquery()))
+    if search:
+        query = query.filter(Category.name_en.contains(search) | Category.name_id.contains(search))
+    return query.order_by(Category.created_at.desc())
+
+def category_has_products(category_id):
+    """True when any product still references the category"""
+    return db.session.query(Product.query.filter_by(category_id=category_id).exists()).scalar()
+
+def order_with_items_or_404(order_id):
+    """An order with items, their products and the products' categories"""
+    return Order.query.options(
+        selectinload(Order.items)
+        .joinedload(OrderItem.product)
+        .joinedload(Product.category)
+    ).filter(Order.id == order_id).first_or_404()
@@ -1,105 +1,23 @@
 from flask import render_template, request, redirect, url_for, session, flash, jsonify
 from app import app, db
-from models import Product, Category, Order, OrderItem, CompanySettings
+from models import Product, Category, Order, OrderItem
+from settings_cache import get_settings
+from preferences import get_preferences, remember_preference, vary_on_preferences
+from pricing import format_currency, get_product_price, convert_currency, price_cart, price_products
+from exchange_rates import get_rate
+import queries
+import dashboard_stats
+from search_index import search_products
+from page_cache import cached_page
+from http_cache import conditional_page
+from database import retry_on_busy
+from cart_store import get_cart, save_cart, clear_cart, cart_quantity, touch_stored_cart
+from images import image_variants, default_gallery_images
+from themes import theme_stylesheet
 import uuid
 from datetime import datetime
 import locale
 
-def detect_user_location():
-    """Detect user location from request headers and IP"""
-    # Check Accept-Language header first
-    accept_language = request.headers.get('Accept-Language', '')
-
-    # Indonesian language detection
-    if any(lang in accept_language.lower() for lang in ['id-id', 'id,', 'id;', 'indonesia']):
-        return 'id', 'IDR'
-
-    # Check for other Asian countries that might prefer IDR
-    asia_countries = ['th-th', 'vi-vn', 'ms-my', 'tl-ph']
-    if any(country in accept_language.lower() for country in asia_countries):
-        return 'id', 'IDR'
-
-    # Check timezone header for Indonesia timezone
-    timezone = request.headers.get('Timezone', '')
-    if 'asia/jakarta' in timezone.lower() or 'wib' in timezone.lower():
-        return 'id', 'IDR'
-
-    # Check User-Agent for Indonesian/Asian keywords
-    user_agent = request.headers.get('User-Agent', '').lower()
-    if any(keyword in user_agent for keyword in ['indonesia', 'jakarta', 'id-', 'asia']):
-        return 'id', 'IDR'
-
-    # Default to English/USD for international users
-    return 'en', 'USD'
-
-# Exchange rate (USD to IDR) - Base currency is IDR
-# In production, this should be fetched from a live API
-USD_TO_IDR_RATE = 15300  # Approximate rate, update as needed
-
-def format_currency(amount, currency='USD', lang='en'):
-    """Format currency based on language and currency type"""
-    # Handle None, undefined, or invalid values
-    if amount is None or str(amount).lower() in ['none', 'undefined', '']:
-        amount = 0
-    
-    try:
-        amount = float(amount)
-    except (ValueError, TypeError):
-        amount = 0
-    
-    if currency == 'IDR':
-        # Indonesian Rupiah formatting
-        return f"Rp.{amount:,.0f}"
-    else:
-        # USD formatting
-        return f"${amount:,.2f}"
-
-def get_product_price(product, currency='USD'):
-    """Get product price in specified currency with IDR as base currency"""
-    try:
-        # IDR is the base currency - always use price_idr field as the source of truth
-        if hasattr(product, 'price_idr') and product.price_idr is not None:
-            base_price_idr = float(product.price_idr)
-        else:
-            # Fallback: if price_idr is not available, check price_usd and convert
-            if hasattr(product, 'price_usd') and product.price_usd is not None:
-                base_price_idr = float(product.price_usd) * USD_TO_IDR_RATE
-            else:
-                return 0
-
-        if currency == 'IDR':
-            return base_price_idr
-        elif currency == 'USD':
-            return base_price_idr / USD_TO_IDR_RATE
-        else:
-            # For other currencies, add conversion logic here
-            return base_price_idr
-
-    except (ValueError, TypeError, AttributeError) as e:
-        print(f"Error in get_product_price: {e}")
-        return 0
-
-def convert_currency(amount, from_currency, to_currency):
-    """Convert amount between currencies with IDR as base"""
-    if from_currency == to_currency:
-        return amount
-
-    # Convert everything through IDR as base currency
-    if from_currency == 'USD':
-        # USD to IDR first
-        amount_idr = amount * USD_TO_IDR_RATE
-        if to_currency == 'IDR':
-            return amount_idr
-        else:
-            return amount_idr  # If other currency needed, add logic here
-    elif from_currency == 'IDR':
-        if to_currency == 'USD':
-            return amount / USD_TO_IDR_RATE
-        else:
-            return amount  # If other currency needed, add logic here
-
-    return amount
-
 @app.context_processor
 def utility_processor():
     """Make utility functions available in all templates"""
@@ -107,38 +25,34 @@ def utility_processor():
         format_currency=format_currency,
         get_product_price=get_product_price,
         convert_currency=convert_currency,
-        USD_TO_IDR_RATE=USD_TO_IDR_RATE
+        cart_quantity=cart_quantity,
+        image_variants=image_variants,
+        default_gallery_images=default_gallery_images,
+        theme_stylesheet=theme_stylesheet,
+        USD_TO_IDR_RATE=get_rate('USD')
     )
 
+app.after_request(vary_on_preferences)
+app.after_request(touch_stored_cart)
+
 @app.route('/')
+@conditional_page
+@cached_page
 def index():
-    # Auto-detect language and currency if not set
-    if not request.args.get('lang') and not session.get('lang'):
-        detected_lang, detected_currency = detect_user_location()
-        session['lang'] = detected_lang
-        session['currency'] = detected_currency
-
     # Get language and currency preference
-    lang = request.args.get('lang', session.get('lang', 'en'))
-    currency = request.args.get('currency', session.get('currency', 'USD'))
-    session['lang'] = lang
-    session['currency'] = currency
+    lang, currency = get_preferences()
 
     # Get company settings
-    settings = CompanySettings.query.first()
-    if not settings:
-        settings = CompanySettings()
-        db.session.add(settings)
-        db.session.commit()
+    settings = get_settings()
 
     # Get categories with products
     categories = Category.query.all()
     # Get featured products (limit to 6)
-    featured_products = Product.query.filter_by(is_available=True).limit(6).all()
+    featured_products = queries.featured_products(limit=6)
 
 
     # Choose template based on layout setting
-    if settings and settings.layout_type == 'carousel':
+    if settings.layout_type == 'carousel':
         template = 'index_carousel.html'
     else:
         template = 'index.html'
@@ -146,6 +60,7 @@ def index():
     return render_template(template, 
                          categories=categories, 
                          featured_products=featured_products,
+                         prices=price_products(featured_products, currency, lang),
                          settings=settings,
                          lang=lang,
                          currency=currency,
@@ -153,31 +68,18 @@ def index():
                          get_product_price=get_product_price)
 
 @app.route('/products')
+@conditional_page
+@cached_page
 def products():
-    # Auto-detect language and currency if not set
-    if not request.args.get('lang') and not session.get('lang'):
-        detected_lang, detected_currency = detect_user_location()
-        session['lang'] = detected_lang
-        session['currency'] = detected_currency
-
-    lang = request.args.get('lang', session.get('lang', 'en'))
-    currency = request.args.get('currency', session.get('currency', 'USD'))
-    session['lang'] = lang
-    session['currency'] = currency
+    lang, currency = get_preferences()
 
     category_id = request.args.get('category')
     search = request.args.get('search', '')
 
-    query = Product.query.filter_by(is_available=True)
-
-    if category_id:
-        query = query.filter_by(category_id=category_id)
+    query = queries.catalog_products(category_id)
 
     if search:
-        if lang == 'id':
-            query = query.filter(Product.name_id.contains(search))
-        else:
-            query = query.filter(Product.name_en.contains(search))
+        query = search_products(query, search)
 
     products = query.all()
     categories = Category.query.all()
@@ -185,51 +87,42 @@ def products():
 
     return render_template('products.html', 
                          products=products, 
+                         prices=price_products(products, currency, lang),
                          categories=categories,
                          selected_category=selected_category,
                          search=search,
+                         settings=get_settings(),
                          lang=lang,
                          currency=currency,
                          format_currency=format_currency,
                          get_product_price=get_product_price)
 
 @app.route('/product/<int:product_id>')
+@conditional_page
+@cached_page
 def product_detail(product_id):
-    # Auto-detect language and currency if not set
-    if not request.args.get('lang') and not session.get('lang'):
-        detected_lang, detected_currency = detect_user_location()
-        session['lang'] = detected_lang
-        session['currency'] = detected_currency
-
-    lang = request.args.get('lang', session.get('lang', 'en'))
-    currency = request.args.get('currency', session.get('currency', 'USD'))
-    session['lang'] = lang
-    session['currency'] = currency
-
-    product = Product.query.get_or_404(product_id)
-    related_products = Product.query.filter_by(
-        category_id=product.category_id,
-        is_available=True
-    ).filter(Product.id != product_id).limit(4).all()
+    lang, currency = get_preferences()
+
+    product = queries.product_detail_or_404(product_id)
+    related_products = queries.related_products(product, limit=4)
 
     return render_template('product_detail.html', 
                          product=product, 
                          related_products=related_products,
+                         prices=price_products([product, *related_products], currency, lang),
+                         settings=get_settings(),
                          lang=lang,
                          currency=currency,
                          format_currency=format_currency,
                          get_product_price=get_product_price)
 
 @app.route('/add_to_cart', methods=['POST'])
+@retry_on_busy
 def add_to_cart():
     product_id = int(request.form['product_id'])
     quantity = int(request.form['quantity'])
 
-    # Initialize cart if not exists
-    if 'cart' not in session:
-        session['cart'] = {}
-
-    cart = session['cart']
+    cart = get_cart()
     product_id_str = str(product_id)
 
     if product_id_str in cart:
@@ -237,42 +130,23 @@ def add_to_cart():
     else:
         cart[product_id_str] = quantity
 
-    session['cart'] = cart
+    save_cart(cart)
     flash('Product added to cart successfully!', 'success')
 
     return redirect(request.referrer or url_for('products'))
 
 @app.route('/cart')
 def cart():
-    lang = request.args.get('lang', session.get('lang', 'en'))
-    currency = request.args.get('currency', session.get('currency', 'USD'))
-    session['lang'] = lang
-    session['currency'] = currency
+    lang, currency = get_preferences()
 
     # Get settings for consistent styling
-    settings = CompanySettings.query.first()
-
-    cart = session.get('cart', {})
-    cart_items = []
-    total = 0
-
-    for product_id_str, quantity in cart.items():
-        product = Product.query.get(int(product_id_str))
-        if product and product.is_available:
-            price = get_product_price(product, currency)
-            item_total = price * quantity
-            cart_items.append({
-                'product': product,
-                'quantity': quantity,
-                'price': price,
-                'item_total': item_total,
-                'total': item_total
-            })
-            total += item_total
+    settings = get_settings()
+
+    priced_cart = price_cart(get_cart(), currency)
 
     return render_template('cart.html', 
-                         cart_items=cart_items, 
-                         total=total,
+                         cart_items=priced_cart.items, 
+                         total=priced_cart.total,
                          lang=lang,
                          currency=currency,
                          settings=settings,
@@ -280,39 +154,38 @@ def cart():
                          get_product_price=get_product_price)
 
 @app.route('/update_cart', methods=['POST'])
+@retry_on_busy
 def update_cart():
     product_id = request.form['product_id']
     quantity = int(request.form['quantity'])
 
-    cart = session.get('cart', {})
+    cart = get_cart()
 
     if quantity > 0:
         cart[product_id] = quantity
     else:
         cart.pop(product_id, None)
 
-    session['cart'] = cart
+    save_cart(cart)
     return redirect(url_for('cart'))
 
 @app.route('/remove_from_cart', methods=['POST'])
+@retry_on_busy
 def remove_from_cart():
     product_id = request.form['product_id']
-    cart = session.get('cart', {})
+    cart = get_cart()
     cart.pop(product_id, None)
-    session['cart'] = cart
+    save_cart(cart)
 
     flash('Product removed from cart', 'info')
     return redirect(url_for('cart'))
 
 @app.route('/login', methods=['GET', 'POST'])
 def customer_login():
-    lang = request.args.get('lang', session.get('lang', 'en'))
-    currency = request.args.get('currency', session.get('currency', 'USD'))
-    session['lang'] = lang
-    session['currency'] = currency
+    lang, currency = get_preferences()
 
     # Get settings for consistent styling
-    settings = CompanySettings.query.first()
+    settings = get_settings()
 
     if request.method == 'POST':
         email = request.form['email']
@@ -339,44 +212,26 @@ def customer_logout():
 
 @app.route('/checkout')
 def checkout():
-    lang = request.args.get('lang', session.get('lang', 'en'))
-    currency = request.args.get('currency', session.get('currency', 'USD'))
-    session['lang'] = lang
-    session['currency'] = currency
+    lang, currency = get_preferences()
 
     # Check if user is logged in
     if not session.get('is_logged_in'):
         flash('Please login to proceed to checkout', 'warning')
         return redirect(url_for('customer_login'))
 
-    cart = session.get('cart', {})
+    cart = get_cart()
     if not cart:
         flash('Your cart is empty', 'warning')
         return redirect(url_for('products'))
 
-    cart_items = []
-    total = 0
-
-    for product_id, quantity in cart.items():
-        product = Product.query.get(int(product_id))
-        if product and product.is_available:
-            price = get_product_price(product, currency)
-            item_total = price * quantity
-            cart_items.append({
-                'product': product,
-                'quantity': quantity,
-                'price': price,
-                'item_total': item_total,
-                'total': item_total
-            })
-            total += item_total
+    priced_cart = price_cart(cart, currency)
 
     # Get settings for consistent styling
-    settings = CompanySettings.query.first()
+    settings = get_settings()
 
     return render_template('checkout.html', 
-                         cart_items=cart_items, 
-                         total=total,
+                         cart_items=priced_cart.items, 
+                         total=priced_cart.total,
                          lang=lang,
                          currency=currency,
                          settings=settings,
@@ -384,9 +239,10 @@ def checkout():
                          get_product_price=get_product_price)
 
 @app.route('/place_order', methods=['POST'])
+@retry_on_busy
 def place_order():
-    lang = session.get('lang', 'en')
-    cart = session.get('cart', {})
+    lang, currency = get_preferences()
+    cart = get_cart()
 
     if not cart:
         flash('Your cart is empty', 'warning')
@@ -404,43 +260,37 @@ def place_order():
         customer_country=request.form['customer_country'],
         shipping_address=request.form['shipping_address'],
         notes=request.form.get('notes', ''),
-        total_amount=0  # Will be calculated below
+        total_amount=0,  # Will be calculated below
+        currency=currency
     )
 
     db.session.add(order)
     db.session.flush()  # Get the order ID
 
-    total_amount = 0
-
     # Create order items
-    currency = session.get('currency', 'USD')
-    for product_id, quantity in cart.items():
-        product = Product.query.get(int(product_id))
-        if product and product.is_available:
-            unit_price = get_product_price(product, currency)
-            item_total = unit_price * quantity
-
-            order_item = OrderItem(
-                order_id=order.id,
-                product_id=product.id,
-                quantity=quantity,
-                unit_price=unit_price,
-                total_price=item_total
-            )
-
-            db.session.add(order_item)
-            total_amount += item_total
-
-    order.total_amount = total_amount
+    priced_cart = price_cart(cart, currency)
+    db.session.add_all([
+        OrderItem(
+            order_id=order.id,
+            product_id=item['product'].id,
+            quantity=item['quantity'],
+            unit_price=item['price'],
+            total_price=item['item_total']
+        )
+        for item in priced_cart
+    ])
+
+    order.total_amount = priced_cart.total
+    dashboard_stats.record_order_placed(order)
     db.session.commit()
 
     # Clear cart
-    session['cart'] = {}
+    clear_cart()
 
     flash(f'Order placed successfully! Order number: {order_number}', 'success')
     return redirect(url_for('index'))
 
 @app.route('/set_language/<lang>')
 def set_language(lang):
-    session['lang'] = lang
+    remember_preference('lang', lang)
     return redirect(request.referrer or url_for('index'))
\ No newline at end of file
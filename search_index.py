@@ -0,0 +1,219 @@
+import re
+import time
+from sqlalchemy import text, bindparam, literal_column, table, column, func, or_
+from app import db
+from models import Product, Category
+
+# Bilingual product search index. SQLite uses an FTS5 table whose rowid is the
+# product id; PostgreSQL uses a tsvector table with a GIN index. Both are kept
+# up to date by the admin write paths calling index_product(),
+# remove_product() and reindex_category(); bulk imports use index_products().
+
+SEARCH_TABLE = 'product_search'
+MAX_SEARCH_TERMS = 8
+
+# Products re-indexed per statement by index_products()
+INDEX_BATCH_SIZE = 500
+
+# How long a missing index is not looked up again by searches. Index writes
+# always look, so a worker started before `flask init-db` created the index
+# keeps it in step with the catalog from its first admin edit on.
+INDEX_RECHECK_SECONDS = 60
+
+# bm25 column weights: names, names, descriptions, descriptions, category
+SQLITE_WEIGHTS = '10.0, 10.0, 2.0, 2.0, 5.0'
+
+_backend = None
+_checked_at = None
+
+def _dialect():
+    return db.engine.dialect.name
+
+def search_backend(recheck=False):
+    """'fts5', 'tsvector' or None when no index exists (LIKE fallback).
+
+    Only a found index is remembered; without one the table is looked up
+    again after INDEX_RECHECK_SECONDS, or right away with `recheck`.
+    """
+    global _backend, _checked_at
+    if _backend is None and (recheck or _checked_at is None
+                             or time.monotonic() - _checked_at >= INDEX_RECHECK_SECONDS):
+        _checked_at = time.monotonic()
+        if db.inspect(db.engine).has_table(SEARCH_TABLE):
+            _backend = {'sqlite': 'fts5', 'postgresql': 'tsvector'}.get(_dialect())
+    return _backend
+
+def ensure_search_index():
+    """Create the search table if missing and fill it from the catalog"""
+    if db.inspect(db.engine).has_table(SEARCH_TABLE):
+        # Refill an index left empty by an interrupted start-up
+        indexed = db.session.execute(text(f"SELECT COUNT(*) FROM {SEARCH_TABLE}")).scalar()
+        if indexed or not Product.query.count():
+            return False
+        rebuild_search_index()
+        db.session.commit()
+        return True
+
+    dialect = _dialect()
+    if dialect == 'sqlite':
+        db.session.execute(text(
+            f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+            "name_en, name_id, description_en, description_id, category_name, "
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        ))
+    elif dialect == 'postgresql':
+        db.session.execute(text(
+            f"CREATE TABLE {SEARCH_TABLE} ("
+            "product_id INTEGER PRIMARY KEY REFERENCES product (id) ON DELETE CASCADE, "
+            "document TSVECTOR NOT NULL)"
+        ))
+        db.session.execute(text(
+            f"CREATE INDEX ix_{SEARCH_TABLE}_document ON {SEARCH_TABLE} USING GIN (document)"
+        ))
+    else:
+        return False
+
+    rebuild_search_index()
+    db.session.commit()
+    return True
+
+def rebuild_search_index():
+    """Re-index every product (caller commits)"""
+    if not search_backend(recheck=True):
+        return 0
+    db.session.execute(text(f"DELETE FROM {SEARCH_TABLE}"))
+    products = Product.query.options(db.joinedload(Product.category)).all()
+    for product in products:
+        _write_row(product)
+    return len(products)
+
+def _category_name(product):
+    # category_id may have just changed, so don't trust the loaded relationship
+    category = db.session.get(Category, product.category_id)
+    if not category:
+        return ''
+    return f"{category.name_en or ''} {category.name_id or ''}"
+
+def _write_row(product):
+    params = {
+        'product_id': product.id,
+        'name_en': product.name_en or '',
+        'name_id': product.name_id or '',
+        'description_en': product.description_en or '',
+        'description_id': product.description_id or '',
+        'category_name': _category_name(product),
+    }
+    if search_backend() == 'fts5':
+        db.session.execute(text(
+            f"INSERT INTO {SEARCH_TABLE} "
+            "(rowid, name_en, name_id, description_en, description_id, category_name) "
+            "VALUES (:product_id, :name_en, :name_id, :description_en, :description_id, :category_name)"
+        ), params)
+    else:
+        db.session.execute(text(
+            f"INSERT INTO {SEARCH_TABLE} (product_id, document) VALUES (:product_id, "
+            "setweight(to_tsvector('simple', :name_en || ' ' || :name_id), 'A') || "
+            "setweight(to_tsvector('simple', :category_name), 'B') || "
+            "setweight(to_tsvector('simple', :description_en || ' ' || :description_id), 'C')) "
+            "ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document"
+        ), params)
+
+def index_product(product):
+    """Add or refresh a product's index row; call after flush, before commit"""
+    if not search_backend(recheck=True):
+        return
+    if search_backend() == 'fts5':
+        remove_product(product.id)
+    _write_row(product)
+
+def index_products(product_ids):
+    """Add or refresh the index rows of many products with set-based statements"""
+    backend = search_backend(recheck=True)
+    if not backend:
+        return
+    product_ids = list(product_ids)
+    source = (
+        "FROM product p LEFT JOIN category c ON c.id = p.category_id WHERE p.id IN :ids"
+    )
+    category_name = "COALESCE(c.name_en, '') || ' ' || COALESCE(c.name_id, '')"
+    for start in range(0, len(product_ids), INDEX_BATCH_SIZE):
+        params = {'ids': product_ids[start:start + INDEX_BATCH_SIZE]}
+        if backend == 'fts5':
+            db.session.execute(text(f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN :ids")
+                               .bindparams(bindparam('ids', expanding=True)), params)
+            statement = (
+                f"INSERT INTO {SEARCH_TABLE} "
+                "(rowid, name_en, name_id, description_en, description_id, category_name) "
+                "SELECT p.id, COALESCE(p.name_en, ''), COALESCE(p.name_id, ''), "
+                f"COALESCE(p.description_en, ''), COALESCE(p.description_id, ''), {category_name} "
+                f"{source}"
+            )
+        else:
+            statement = (
+                f"INSERT INTO {SEARCH_TABLE} (product_id, document) SELECT p.id, "
+                "setweight(to_tsvector('simple', COALESCE(p.name_en, '') || ' ' || COALESCE(p.name_id, '')), 'A') || "
+                f"setweight(to_tsvector('simple', {category_name}), 'B') || "
+                "setweight(to_tsvector('simple', COALESCE(p.description_en, '') || ' ' || "
+                "COALESCE(p.description_id, '')), 'C') "
+                f"{source} "
+                "ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document"
+            )
+        db.session.execute(text(statement).bindparams(bindparam('ids', expanding=True)), params)
+
+def remove_product(product_id):
+    """Drop a product's index row; call before commit"""
+    backend = search_backend(recheck=True)
+    if backend == 'fts5':
+        db.session.execute(text(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = :product_id"),
+                           {'product_id': product_id})
+    elif backend == 'tsvector':
+        db.session.execute(text(f"DELETE FROM {SEARCH_TABLE} WHERE product_id = :product_id"),
+                           {'product_id': product_id})
+
+def reindex_category(category):
+    """Refresh the category name on all of its products' index rows"""
+    if not search_backend(recheck=True):
+        return
+    for product in Product.query.filter_by(category_id=category.id).all():
+        index_product(product)
+
+def search_terms(search):
+    """Lower-cased word tokens from user input"""
+    return re.findall(r'\w+', (search or '').lower())[:MAX_SEARCH_TERMS]
+
+def _ranked_ids(terms):
+    """Subquery of (product_id, rank) for matches, lower rank is better"""
+    if search_backend() == 'fts5':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return (db.select(literal_column('rowid').label('product_id'),
+                          literal_column(f'bm25({SEARCH_TABLE}, {SQLITE_WEIGHTS})').label('rank'))
+                .select_from(table(SEARCH_TABLE))
+                .where(text(f"{SEARCH_TABLE} MATCH :match").bindparams(match=match))
+                .subquery())
+
+    search_table = table(SEARCH_TABLE, column('product_id'), column('document'))
+    ts_query = func.to_tsquery('simple', ' & '.join(f'{term}:*' for term in terms))
+    return (db.select(search_table.c.product_id,
+                      (-func.ts_rank(search_table.c.document, ts_query)).label('rank'))
+            .where(search_table.c.document.op('@@')(ts_query))
+            .subquery())
+
+def search_products(query, search, ranked=True):
+    """Restrict a Product query to matches for `search`, best matches first when ranked"""
+    terms = search_terms(search)
+    if not terms:
+        return query
+
+    if not search_backend():
+        for term in terms:
+            pattern = f'%{term}%'
+            query = query.filter(or_(Product.name_en.ilike(pattern), Product.name_id.ilike(pattern),
+                                     Product.description_en.ilike(pattern),
+                                     Product.description_id.ilike(pattern)))
+        return query
+
+    matches = _ranked_ids(terms)
+    query = query.join(matches, matches.c.product_id == Product.id)
+    if ranked:
+        query = query.order_by(matches.c.rank)
+    return query
@@ -0,0 +1,85 @@
+import threading
+import time
+from types import MappingProxyType
+from app import app, db
+from models import CompanySettings
+
+# Other workers pick up admin changes after this many seconds; the worker
+# that handled the admin request is invalidated immediately.
+DEFAULT_SETTINGS_CACHE_TTL = 60
+
+_lock = threading.Lock()
+_snapshot = None
+_loaded_at = 0.0
+_version = 0
+
+class SettingsSnapshot:
+    """Read-only, pre-parsed copy of the CompanySettings row.
+
+    Exposes every column as an attribute (so templates written against the
+    model keep working) plus the parsed helpers from CompanySettings, computed
+    once per load instead of once per render.
+    """
+
+    __slots__ = ('_values', '_localized', 'version')
+
+    def __init__(self, settings, version):
+        values = {column.name: getattr(settings, column.name)
+                  for column in CompanySettings.__table__.columns}
+        values['gallery_list'] = tuple(settings.gallery_list)
+        values['theme_colors'] = MappingProxyType(settings.theme_colors)
+        object.__setattr__(self, '_values', MappingProxyType(values))
+        object.__setattr__(self, '_localized', MappingProxyType({
+            lang: MappingProxyType(settings.localized(lang)) for lang in ('en', 'id')
+        }))
+        object.__setattr__(self, 'version', version)
+
+    def __getattr__(self, name):
+        try:
+            return self._values[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name, value):
+        raise AttributeError('SettingsSnapshot is read-only')
+
+    def localized(self, lang):
+        """Company texts for a language (anything but 'en' falls back to Indonesian)"""
+        return self._localized['en' if lang == 'en' else 'id']
+
+    def __repr__(self):
+        return f'<SettingsSnapshot v{self.version} {self.company_name_en}>'
+
+def _load_settings():
+    settings = CompanySettings.query.first()
+    if not settings:
+        settings = CompanySettings()
+        db.session.add(settings)
+        db.session.commit()
+    return settings
+
+def get_settings():
+    """Return the cached settings snapshot, loading it on first use or after expiry"""
+    global _snapshot, _loaded_at
+
+    ttl = app.config.get('SETTINGS_CACHE_TTL', DEFAULT_SETTINGS_CACHE_TTL)
+    snapshot = _snapshot
+    if snapshot is not None and time.monotonic() - _loaded_at < ttl:
+        return snapshot
+
+    with _lock:
+        if _snapshot is None or time.monotonic() - _loaded_at >= ttl:
+            _snapshot = SettingsSnapshot(_load_settings(), _version)
+            _loaded_at = time.monotonic()
+        return _snapshot
+
+def invalidate_settings():
+    """Drop the cached snapshot; call after committing a CompanySettings change"""
+    global _snapshot, _version
+    with _lock:
+        _version += 1
+        _snapshot = None
+
+def settings_version():
+    """Counter bumped on every invalidation in this process"""
+    return _version
@@ -460,23 +460,6 @@ function setHeroBackground(imageUrl) {
 
 // Get gallery images from meta tag or data attribute
 function getGalleryImages() {
-    // First priority: Check for uploaded images in static folder (for theme 1 and 2)
-    const currentTheme = document.body.getAttribute('data-theme');
-    
-    if (currentTheme === 'nature_life' || currentTheme === 'theme2') {
-        const uploadedImages = [
-            '/static/uploads/75a6fa78bd5a43d8a44e6b89aa9df62e_Cara-Packing-Daun-Pisang.jpg',
-            '/static/uploads/174d8d4619da42ca91e895cff22ef0a2_Cara-Packing-Daun-Pisang.jpg',
-            '/static/uploads/7b32c3f6c9814457b8895b3ca5224276_Cara-Packing-Daun-Pisang.jpg',
-            '/static/uploads/8cb860c8ae5a472fafa627c098f03a4e_Cara-Packing-Daun-Pisang.jpg',
-            '/static/uploads/f9d1c55013b5436c8c0e5481328fcee1_Cara-Packing-Daun-Pisang.jpg'
-        ];
-        
-        console.log('Using uploaded gallery images for theme 1/2:', uploadedImages);
-        return uploadedImages;
-    }
-
-    // For other themes, try meta tag first
     const metaGallery = document.querySelector('meta[name="gallery-images"]');
     if (metaGallery && metaGallery.content && metaGallery.content.trim()) {
         const images = metaGallery.content.split(',').map(url => url.trim()).filter(url => url);
@@ -484,6 +467,15 @@ function getGalleryImages() {
         return images;
     }
 
+    // Theme 1 and 2 fall back to the bundled images until a gallery is uploaded
+    const currentTheme = document.body.getAttribute('data-theme');
+    const defaultGallery = document.querySelector('meta[name="default-gallery-images"]');
+    if ((currentTheme === 'nature_life' || currentTheme === 'theme2') && defaultGallery && defaultGallery.content) {
+        const images = defaultGallery.content.split(',').map(url => url.trim()).filter(url => url);
+        console.log('Using bundled gallery images for theme 1/2:', images);
+        return images;
+    }
+
     // Fallback to data attribute
     const heroSection = document.querySelector('.hero-section');
     if (heroSection && heroSection.dataset.galleryImages) {
@@ -0,0 +1,31 @@
+import os
+import tempfile
+
+import pytest
+
+# Point the app at a throwaway SQLite database before it is imported
+_db_dir = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_db_dir, 'tests.db')}"
+
+from app import create_app, init_database  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def app():
+    application = create_app()
+    init_database()
+    application.config['PAGE_CACHE_ENABLED'] = False
+    return application
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def media_store(tmp_path, monkeypatch):
+    """An empty local media store in a temporary directory"""
+    import media_storage
+    monkeypatch.setattr(media_storage, '_storage', media_storage.LocalStorage(str(tmp_path), '/static/uploads/'))
+    return tmp_path
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import cart_store
+from app import db
+from models import Cart
+
+
+@pytest.fixture
+def database_carts(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'CART_STORE', 'database')
+
+
+def test_stale_cart_id_is_forgotten(client, database_carts):
+    with client.session_transaction() as session:
+        session['cart_id'] = 'no-such-cart'
+
+    client.get('/products')
+    with client.session_transaction() as session:
+        assert 'cart_id' not in session
+
+
+def test_stored_cart_keeps_its_id(app, client, database_carts):
+    with app.app_context():
+        db.session.merge(Cart(id='kept-cart', items='1:2', updated_at=datetime.utcnow()))
+        db.session.commit()
+    with client.session_transaction() as session:
+        session['cart_id'] = 'kept-cart'
+
+    client.get('/products')
+    with client.session_transaction() as session:
+        assert session['cart_id'] == 'kept-cart'
+
+
+def test_reading_a_cart_commits_nothing_pending(app, database_carts):
+    with app.app_context():
+        db.session.merge(Cart(id='old-cart', items='1:1', updated_at=datetime.utcnow() - timedelta(days=2)))
+        db.session.commit()
+
+    with app.test_request_context():
+        from flask import session
+        session['cart_id'] = 'old-cart'
+        db.session.add(Cart(id='half-written', items='2:1'))
+        assert cart_store.get_cart() == {'1': 1}
+        db.session.rollback()
+        assert db.session.get(Cart, 'half-written') is None
+
+
+def test_visit_pushes_back_the_expiry(app, client, database_carts):
+    visited = datetime.utcnow() - timedelta(days=2)
+    with app.app_context():
+        db.session.merge(Cart(id='visited-cart', items='1:1', updated_at=visited))
+        db.session.commit()
+    with client.session_transaction() as session:
+        session['cart_id'] = 'visited-cart'
+
+    client.get('/products')
+    with app.app_context():
+        assert db.session.get(Cart, 'visited-cart').updated_at > visited
@@ -0,0 +1,93 @@
+import pytest
+from sqlalchemy import event
+
+from app import db
+
+
+@pytest.fixture
+def page_cache_enabled(app, monkeypatch):
+    import page_cache
+    monkeypatch.setitem(app.config, 'PAGE_CACHE_ENABLED', True)
+    page_cache.bump_catalog_version()
+
+
+@pytest.fixture
+def statements(app):
+    issued = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        issued.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    yield issued
+    event.remove(engine, 'before_cursor_execute', record)
+
+
+def test_cached_page_revalidates_without_queries(client, page_cache_enabled, statements):
+    first = client.get('/products')
+    assert first.headers['X-Page-Cache'] == 'miss'
+
+    statements.clear()
+    hit = client.get('/products')
+    assert hit.headers['X-Page-Cache'] == 'hit'
+    assert hit.headers['ETag'] == first.headers['ETag']
+    not_modified = client.get('/products', headers={'If-None-Match': first.headers['ETag']})
+    assert not_modified.status_code == 304
+    assert statements == []
+
+
+def test_rate_change_changes_validators(app, client):
+    import exchange_rates
+    before = client.get('/products?currency=EUR')
+
+    with app.app_context():
+        exchange_rates.set_rate('EUR', exchange_rates.current_rates().get('EUR', 17000) + 100)
+        db.session.commit()
+        exchange_rates.rates_changed()
+
+    revalidated = client.get('/products?currency=EUR', headers={'If-None-Match': before.headers['ETag']})
+    assert revalidated.status_code == 200
+    assert revalidated.headers['ETag'] != before.headers['ETag']
+
+
+def test_rate_taking_effect_changes_validators(app, client, monkeypatch):
+    from datetime import date, timedelta
+    import exchange_rates
+    from models import ExchangeRate
+
+    with app.app_context():
+        exchange_rates.set_rate('SGD', 12000, date.today() + timedelta(days=1))
+        db.session.commit()
+        exchange_rates.rates_changed()
+    before = client.get('/products')
+
+    # The day arrives: no write, the cached rates just expire and reload
+    with app.app_context():
+        db.session.execute(db.update(ExchangeRate).where(ExchangeRate.currency == 'SGD')
+                           .values(effective_date=date.today()))
+        db.session.commit()
+    monkeypatch.setitem(app.config, 'EXCHANGE_RATE_CACHE_TTL', 0)
+
+    revalidated = client.get('/products', headers={'If-None-Match': before.headers['ETag']})
+    assert revalidated.status_code == 200
+
+
+def test_detected_preferences_are_stored_once(client):
+    first = client.get('/products', headers={'Accept-Language': 'id-ID'})
+    assert 'Accept-Language' in first.headers['Vary']
+    assert 'User-Agent' not in first.headers['Vary']
+    assert 'private' in first.headers['Cache-Control']
+
+    later = client.get('/products')
+    assert later.headers['Vary'] == 'Cookie'
+    assert 'Set-Cookie' not in later.headers
+    assert 'ID | IDR' in later.get_data(as_text=True)
+
+
+def test_language_choice_keeps_detected_currency(client):
+    client.get('/set_language/id', headers={'Accept-Language': 'id-ID'})
+    client.get('/products', headers={'Accept-Language': 'id-ID'})
+    page = client.get('/products')
+    assert 'ID | IDR' in page.get_data(as_text=True)
@@ -0,0 +1,92 @@
+import hashlib
+import io
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+import images
+
+needs_pillow = pytest.mark.skipif(not images.pillow_available(), reason='Pillow is not installed')
+
+
+def jpeg_with_exif():
+    from PIL import Image
+    exif = Image.Exif()
+    exif[0x010F] = 'Camera Maker'  # Make
+    exif[0x0112] = 6  # Orientation: rotate 90 degrees clockwise
+    buffer = io.BytesIO()
+    Image.new('RGB', (80, 40), 'green').save(buffer, 'JPEG', exif=exif)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def upload(app, media_store, monkeypatch):
+    monkeypatch.setattr(images, 'submit_variants', lambda filename, force=False: None)
+
+    def upload(data, filename='photo.jpg'):
+        with app.test_request_context():
+            url = images.save_upload(FileStorage(io.BytesIO(data), filename=filename))
+        return media_store / url.rsplit('/', 1)[1]
+    return upload
+
+
+@needs_pillow
+def test_upload_is_stored_stripped_under_its_content_hash(upload):
+    from PIL import Image
+    path = upload(jpeg_with_exif())
+
+    data = path.read_bytes()
+    assert path.name == f'{hashlib.sha256(data).hexdigest()[:images.HASH_LENGTH]}.jpg'
+    with Image.open(path) as stored:
+        assert not stored.getexif()
+        assert stored.size == (40, 80)  # turned upright before the orientation tag was dropped
+
+
+@needs_pillow
+def test_same_upload_reuses_the_stored_file(upload, media_store):
+    first = upload(jpeg_with_exif(), 'a.jpg')
+    second = upload(jpeg_with_exif(), 'b.jpg')
+    assert first == second
+    assert [path.name for path in media_store.iterdir()] == [first.name]
+
+
+@needs_pillow
+def test_reused_upload_outlives_the_gc_grace_period(app, upload, media_store, monkeypatch):
+    import os
+    first = upload(jpeg_with_exif(), 'a.jpg')
+    digest, extension = first.name.split('.')
+    variants = [media_store / name for name in images._variant_names(digest, extension)]
+    for path in [first, *variants]:
+        path.touch()
+        os.utime(path, (0, 0))  # orphaned long ago
+
+    upload(jpeg_with_exif(), 'b.jpg')
+    # The record referring to it is not committed yet
+    monkeypatch.setitem(app.config, 'MEDIA_GC_GRACE_SECONDS', 3600)
+    with app.app_context():
+        images.collect_garbage()
+    assert all(path.exists() for path in [first, *variants])
+
+
+@needs_pillow
+def test_unreadable_image_is_rejected(upload):
+    with pytest.raises(images.UploadRejected):
+        upload(b'\xff\xd8\xff' + b'not really a jpeg' * 10)
+
+
+def test_missing_variants_are_not_looked_up_on_every_render(app, media_store, monkeypatch):
+    import media_storage
+    lookups = []
+    store = media_storage.storage()
+    exists = store.exists
+    monkeypatch.setattr(store, 'exists', lambda name: lookups.append(name) or exists(name))
+
+    url = store.url('0123456789abcdef0123.gif')
+    with app.app_context():
+        assert images.image_variants(url) is None
+        assert images.image_variants(url) is None
+        assert len(lookups) == 1
+
+        monkeypatch.setitem(app.config, 'IMAGE_VARIANT_RECHECK_SECONDS', 0)
+        assert images.image_variants(url) is None
+        assert len(lookups) == 2
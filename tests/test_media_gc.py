@@ -0,0 +1,58 @@
+import os
+import re
+import shutil
+from pathlib import Path
+
+import pytest
+
+import images
+
+ROOT = Path(__file__).resolve().parent.parent
+UPLOADS = ROOT / 'static' / 'uploads'
+
+# /static/uploads/<name> or url_for('static', filename='uploads/<name>')
+UPLOAD_REFERENCE = re.compile(r'''uploads/([\w.-]+\.(?:jpe?g|png|gif|webp))''', re.IGNORECASE)
+
+
+def referenced_in_sources():
+    """Upload names written literally into the templates, scripts and stylesheets"""
+    names = set()
+    for folder in ('templates', 'static/js', 'static/css'):
+        for path in (ROOT / folder).rglob('*'):
+            if path.suffix in ('.html', '.js', '.css'):
+                names.update(UPLOAD_REFERENCE.findall(path.read_text(encoding='utf-8')))
+    return names
+
+
+@pytest.fixture
+def store(app, media_store, monkeypatch):
+    """The media store holding copies of the bundled uploads plus one stray file"""
+    for path in UPLOADS.iterdir():
+        if path.is_file():
+            shutil.copy(path, media_store / path.name)
+    (media_store / 'stray.jpg').write_bytes(b'\xff\xd8\xff unused')
+    for path in media_store.iterdir():
+        os.utime(path, (0, 0))
+
+    monkeypatch.setitem(app.config, 'MEDIA_GC_GRACE_SECONDS', 0)
+    return media_store
+
+
+def test_gc_keeps_uploads_referenced_by_templates_and_scripts(app, client, store):
+    html = client.get('/').get_data(as_text=True)
+    referenced = referenced_in_sources() | set(UPLOAD_REFERENCE.findall(html)) | set(images.DEFAULT_GALLERY_FILES)
+
+    with app.app_context():
+        deleted = images.collect_garbage()
+
+    assert deleted == 1
+    assert not (store / 'stray.jpg').exists()
+    missing = sorted(name for name in referenced if not (store / name).exists() and (UPLOADS / name).exists())
+    assert missing == []
+
+
+def test_default_gallery_is_rendered_for_the_scripts(client):
+    html = client.get('/').get_data(as_text=True)
+    meta = re.search(r'<meta name="default-gallery-images" content="([^"]*)">', html)
+    assert meta is not None
+    assert meta.group(1).split(',') == [f'/static/uploads/{name}' for name in images.DEFAULT_GALLERY_FILES]
@@ -0,0 +1,31 @@
+from datetime import datetime
+
+import sqlalchemy as sa
+
+import migrations
+from app import db
+
+
+def test_sales_rollup_is_backfilled_after_create_all(app, tmp_path):
+    from models import Order, OrderItem, DailyProductSales
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'upgrade.db'}")
+    # A version 6 database with one sale, after init_database()'s create_all()
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        version_table = migrations._version_table()
+        version_table.create(bind=conn)
+        conn.execute(version_table.insert(), [{'version': number, 'description': '', 'applied_at': datetime.utcnow()}
+                                              for number in range(1, 7)])
+        conn.execute(sa.insert(Order.__table__).values(
+            id=1, order_number='ORD-1', customer_name='Buyer', customer_email='buyer@example.com',
+            customer_country='Indonesia', shipping_address='Jakarta', total_amount=30.0,
+            currency='USD', status='confirmed', created_at=datetime(2025, 3, 1, 10)))
+        conn.execute(sa.insert(OrderItem.__table__).values(
+            order_id=1, product_id=5, quantity=3, unit_price=10.0, total_price=30.0))
+
+    with app.app_context():
+        assert 7 in migrations.upgrade(engine)
+
+    with engine.connect() as conn:
+        rows = conn.execute(sa.select(DailyProductSales.product_id, DailyProductSales.quantity)).all()
+    assert rows == [(5, 3)]
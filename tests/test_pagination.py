@@ -0,0 +1,40 @@
+import os
+import re
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql
+
+from models import Order
+from pagination import _explain_sql
+
+
+def shipping_query():
+    """The /admin/shipping list query, with its IN filter"""
+    return Order.query.filter(Order.status.in_(['shipped', 'delivered']), Order.is_international.is_(True))
+
+
+def test_postgres_estimate_expands_in_lists(app):
+    with app.app_context():
+        sql, params = _explain_sql(shipping_query().statement, postgresql.psycopg2.dialect())
+
+    assert sql.startswith('EXPLAIN (FORMAT JSON) ')
+    assert 'POSTCOMPILE' not in sql
+    placeholders = re.findall(r'%\((\w+)\)s', sql)
+    assert sorted(placeholders) == sorted(params)
+    assert sorted(params.values()) == ['delivered', 'shipped']
+
+
+@pytest.mark.skipif(not os.environ.get('TEST_POSTGRES_URL'),
+                    reason='set TEST_POSTGRES_URL to run against a PostgreSQL server')
+def test_postgres_estimate_runs(app):
+    engine = create_engine(os.environ['TEST_POSTGRES_URL'])
+    with app.app_context(), engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            Order.__table__.create(connection, checkfirst=True)
+            sql, params = _explain_sql(shipping_query().statement, engine.dialect)
+            plan = connection.exec_driver_sql(sql, params).scalar()
+            assert plan[0]['Plan']['Plan Rows'] >= 0
+        finally:
+            transaction.rollback()
@@ -0,0 +1,12 @@
+import io
+import json
+
+import product_import
+
+
+def test_json_row_that_is_not_an_object_is_reported(app):
+    data = io.BytesIO(json.dumps([['Daun Pisang', 12000], 'Daun Pisang']).encode())
+    with app.app_context():
+        result = product_import.import_products(product_import.read_rows(data, 'products.json'), dry_run=True)
+
+    assert result.errors == [(1, 'row must be a JSON object'), (2, 'row must be a JSON object')]
@@ -0,0 +1,24 @@
+import time
+
+import search_index
+
+
+def started_before_the_index(monkeypatch):
+    """Make this process look like a worker that found no index a moment ago"""
+    monkeypatch.setattr(search_index, '_backend', None)
+    monkeypatch.setattr(search_index, '_checked_at', time.monotonic())
+
+
+def test_missing_index_is_looked_up_again(app, monkeypatch):
+    with app.app_context():
+        started_before_the_index(monkeypatch)
+        assert search_index.search_backend() is None
+
+        monkeypatch.setattr(search_index, 'INDEX_RECHECK_SECONDS', 0)
+        assert search_index.search_backend() == 'fts5'
+
+
+def test_index_writes_find_a_new_index_right_away(app, monkeypatch):
+    with app.app_context():
+        started_before_the_index(monkeypatch)
+        assert search_index.search_backend(recheck=True) == 'fts5'
@@ -0,0 +1,38 @@
+import io
+
+import pytest
+
+
+@pytest.fixture
+def small_requests(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'MAX_CONTENT_LENGTH', 1024)
+
+
+def test_oversized_admin_upload_returns_to_the_form(client, small_requests):
+    with client.session_transaction() as session:
+        session['_user_id'] = '1'
+        session['_fresh'] = True
+
+    response = client.post('/admin/products/add',
+                           data={'image_file': (io.BytesIO(b'0' * 4096), 'big.jpg')},
+                           content_type='multipart/form-data',
+                           headers={'Referer': 'http://localhost/admin/products/add'})
+    assert response.status_code == 302
+    assert response.location.endswith('/admin/products/add')
+
+
+def test_oversized_storefront_post_is_rejected(client, small_requests):
+    response = client.post('/add_to_cart', data={'product_id': '1', 'note': 'x' * 4096})
+    assert response.status_code == 413
+
+
+def test_oversized_admin_upload_without_referrer(client, small_requests):
+    with client.session_transaction() as session:
+        session['_user_id'] = '1'
+        session['_fresh'] = True
+
+    response = client.post('/admin/products/import',
+                           data={'import_file': (io.BytesIO(b'0' * 4096), 'rows.csv')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 302
+    assert response.location.endswith('/admin/products')
@@ -0,0 +1,116 @@
+import hashlib
+import os
+import re
+import threading
+from app import app
+from assets import FINGERPRINT_LENGTH, write_file, write_compressed
+
+# Per-theme stylesheets. static/css/themes.css holds the rules of every
+# preset; pages only need the rules of the selected theme plus the custom
+# palette and gallery background variables, which base.html used to render
+# inline on every request. build_stylesheet() compiles exactly that into
+# static/themes/<content hash>.css (with compressed copies), so pages link
+# one small file that browsers cache for good: new settings give a new name.
+#
+# admin.settings compiles the stylesheet when settings are saved; any other
+# worker (or host) compiles the same file on the first page it renders with
+# the new settings. Superseded stylesheets are a few KB each and are left.
+SOURCE_FILE = 'css/themes.css'
+THEMES_DIR = 'themes'
+DEFAULT_THEME = 'nature_life'
+
+_COMMENT = re.compile(r'/\*.*?\*/', re.DOTALL)
+_THEME_SELECTOR = re.compile(r'\[data-theme="([^"]*)"\]')
+_HEX_COLOR = re.compile(r'^#(?:[0-9a-fA-F]{3}){1,2}$')
+
+_lock = threading.Lock()
+_source = None
+_built = {}
+
+def _split_rules(css):
+    """(prelude, body) of each top-level rule in comment-free CSS"""
+    rules = []
+    depth = 0
+    start = prelude_end = 0
+    for index, char in enumerate(css):
+        if char == '{':
+            if depth == 0:
+                prelude_end = index
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                rules.append((css[start:prelude_end].strip(), css[prelude_end + 1:index].strip()))
+                start = index + 1
+    return rules
+
+def rules_for_theme(css, theme):
+    """The rules of a stylesheet that can apply under data-theme=`theme`"""
+    kept = []
+    for prelude, body in _split_rules(css):
+        if prelude.startswith('@'):
+            body = rules_for_theme(body, theme)
+        else:
+            body = ' '.join(body.split())
+            prelude = ','.join(selector.strip() for selector in prelude.split(',')
+                               if all(name == theme for name in _THEME_SELECTOR.findall(selector)))
+        if prelude and body:
+            kept.append(f'{prelude}{{{body}}}')
+    return '\n'.join(kept)
+
+def _theme_source():
+    global _source
+    if _source is None:
+        with open(os.path.join(app.static_folder, SOURCE_FILE)) as handle:
+            _source = _COMMENT.sub('', handle.read())
+    return _source
+
+def _css_url(url):
+    escaped = url.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '')
+    return f'url("{escaped}")'
+
+def _theme_inputs(settings):
+    """Everything the stylesheet depends on, as a hashable key"""
+    if not settings:  # also an undefined template variable
+        return DEFAULT_THEME, None, None
+    custom = tuple(settings.theme_colors.items()) if settings.theme_mode == 'custom' else None
+    gallery = settings.gallery_list
+    return settings.selected_theme or DEFAULT_THEME, custom, gallery[0] if gallery else None
+
+def _compile(theme, custom, gallery_image):
+    variables = []
+    for name, color in custom or ():
+        if _HEX_COLOR.match(color or ''):
+            variables.append(f'--custom-{name}: {color}')
+    if gallery_image:
+        variables.append(f'--gallery-bg-image: {_css_url(gallery_image)}')
+        if theme == 'theme2':
+            variables.append(f'--gallery-background: {_css_url(gallery_image)}')
+
+    css = rules_for_theme(_theme_source(), theme)
+    if variables:
+        css += '\n:root{' + '; '.join(variables) + '}'
+    return css + '\n'
+
+def build_stylesheet(settings):
+    """Compile and store the stylesheet for the settings' theme; returns its static filename"""
+    inputs = _theme_inputs(settings)
+    data = _compile(*inputs).encode()
+    filename = f'{THEMES_DIR}/{hashlib.sha256(data).hexdigest()[:FINGERPRINT_LENGTH]}.css'
+
+    path = os.path.join(app.static_folder, filename)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Compressed copies first: the stylesheet is served once it exists
+        write_compressed(path, data)
+        write_file(path, data)
+    with _lock:
+        _built[inputs] = filename
+    return filename
+
+def theme_stylesheet(settings):
+    """Static filename of the stylesheet for the settings' theme, compiled on first use"""
+    filename = _built.get(_theme_inputs(settings))
+    if filename is None:
+        filename = build_stylesheet(settings)
+    return filename
@@ -0,0 +1,18 @@
+import re
+
+def sanitize_text(text):
+    """Remove or replace problematic Unicode characters"""
+    if not text:
+        return text
+    # Remove common emoji and special Unicode characters that cause encoding issues
+    # Replace common problematic characters
+    text = re.sub(r'[\u2700-\u27BF]', '', text)  # Remove dingbats
+    text = re.sub(r'[\u2600-\u26FF]', '', text)  # Remove miscellaneous symbols
+    text = re.sub(r'[\u2000-\u206F]', ' ', text)  # Replace general punctuation with space
+    # Ensure the text can be encoded as UTF-8
+    try:
+        text.encode('utf-8')
+        return text.strip()
+    except UnicodeEncodeError:
+        # If still problematic, keep only ASCII characters
+        return ''.join(char for char in text if ord(char) < 128).strip()